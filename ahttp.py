@@ -0,0 +1,83 @@
+# ahttp.py - a minimal non-blocking HTTP(S) GET for uasyncio
+#
+# urequests blocks for the whole TLS handshake and response, which freezes
+# anything being drawn on the display. This does the same job over uasyncio
+# streams so the caller's other tasks (e.g. the render loop) keep running
+# while we wait on the network.
+#
+# Only what the scripts in this repo need is supported: GET, HTTP/1.0 (so the
+# server never sends a chunked body), and a status/headers/body result, or the
+# body handed to a callback a piece at a time as it arrives (get_streamed()).
+
+import uasyncio as asyncio
+
+DEFAULT_TIMEOUT = 10  # seconds for the whole request
+
+
+def parse_url(url):
+    """Split url into (use_ssl, host, port, path)."""
+    scheme, _, rest = url.partition("://")
+    if scheme == "https":
+        use_ssl, port = True, 443
+    elif scheme == "http":
+        use_ssl, port = False, 80
+    else:
+        raise ValueError("Unsupported URL scheme: " + scheme)
+
+    host, slash, path = rest.partition("/")
+    path = slash + path if slash else "/"
+    if ":" in host:
+        host, port = host.split(":", 1)
+        port = int(port)
+    return use_ssl, host, port, path
+
+
+async def _get(url, headers, sink=None):
+    use_ssl, host, port, path = parse_url(url)
+    reader, writer = await asyncio.open_connection(host, port, ssl=True if use_ssl else None)
+    try:
+        request = "GET {} HTTP/1.0\r\nHost: {}\r\n".format(path, host)
+        for name, value in headers.items():
+            request += "{}: {}\r\n".format(name, value)
+        writer.write((request + "\r\n").encode())
+        await writer.drain()
+
+        # Status line, e.g. b"HTTP/1.1 200 OK\r\n"
+        status_line = await reader.readline()
+        status = int(status_line.split(None, 2)[1])
+
+        # Headers, keyed by lower-cased name
+        response_headers = {}
+        while True:
+            line = await reader.readline()
+            if not line or line == b"\r\n":
+                break
+            name, _, value = line.decode().partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+
+        # Body, until the server closes the connection
+        body = b""
+        while True:
+            chunk = await reader.read(512)
+            if not chunk:
+                break
+            if sink is None:
+                body += chunk
+            else:
+                sink(chunk)
+
+        return status, response_headers, body
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+async def get(url, headers=None, timeout=DEFAULT_TIMEOUT):
+    """Fetch url and return (status, headers, body) without blocking other tasks."""
+    return await asyncio.wait_for(_get(url, headers or {}), timeout)
+
+
+async def get_streamed(url, sink, headers=None, timeout=DEFAULT_TIMEOUT):
+    """Fetch url, calling sink(chunk) with each piece of the body, and return (status, headers)."""
+    status, response_headers, _ = await asyncio.wait_for(_get(url, headers or {}, sink), timeout)
+    return status, response_headers
@@ -0,0 +1,314 @@
+# arrivals.py - pull bus arrivals out of a TfL arrivals response as it streams in
+#
+# The TfL StopPoint/<id>/arrivals response is a JSON array of large objects,
+# one per bus, of which the bus board only uses five fields. Parsing it with
+# json would hold the whole response and every object in memory at once, so
+# instead the response is read in CHUNK_SIZE pieces and fed through a small
+# state machine that only keeps those fields (plus the prediction's timestamp,
+# which timeToLive is relative to, and the vehicle) of each top-level object:
+#
+#   arrivals = read_arrivals(response.raw)
+#   for time_to_station, line, destination, platform, time_to_live, timestamp, vehicle in arrivals:
+#       ...
+#   seconds_to_live(arrivals[0])   # how long TfL says the prediction holds
+#
+# Arrivals come back soonest first as tuples (the field indexes are below).
+# At most `capacity` are kept, the soonest ones, and strings are cut short at
+# MAX_TEXT bytes, so memory use doesn't depend on the size of the response.
+#
+# Several stops can be fetched at once over uasyncio, each response parsed as
+# it arrives, and merged into one soonest-first list with each vehicle only
+# once (a bus seen from two nearby stops is shown for the one it reaches first):
+#
+#   arrivals = asyncio.run(fetch_stops(["490007732N", "490007732S"]))
+#
+# At most MAX_CONCURRENT requests are open at a time, as each TLS connection
+# takes a good share of the Pico W's memory, and a stop that doesn't answer
+# within STOP_TIMEOUT seconds is left out rather than holding up the others.
+# If no stop answers, fetch_stops() returns None, so a failed fetch can't be
+# mistaken for an empty board.
+# host/check_arrivals.py checks the results against json on sample payloads.
+
+import heapq
+import ahttp
+import log
+import uasyncio as asyncio
+
+CHUNK_SIZE = 256
+MAX_ARRIVALS = 16
+MAX_TEXT = 40
+MAX_KEY = 16  # longer keys can't be one we want
+MAX_DEPTH = 16
+
+ARRIVALS_URL = "https://api.tfl.gov.uk/StopPoint/{}/arrivals"
+MAX_CONCURRENT = 2
+STOP_TIMEOUT = 10  # seconds
+
+# arrival tuple fields
+TIME_TO_STATION = 0
+LINE = 1
+DESTINATION = 2
+PLATFORM = 3
+TIME_TO_LIVE = 4
+TIMESTAMP = 5
+VEHICLE = 6
+
+KEYS = {
+    b"timeToStation": TIME_TO_STATION,
+    b"lineName": LINE,
+    b"destinationName": DESTINATION,
+    b"platformName": PLATFORM,
+    b"timeToLive": TIME_TO_LIVE,
+    b"timestamp": TIMESTAMP,
+    b"vehicleId": VEHICLE,
+}
+
+OBJECT = 1
+ARRAY = 2
+
+QUOTE = ord('"')
+BACKSLASH = ord("\\")
+ESCAPES = {ord("n"): ord("\n"), ord("t"): ord("\t"), ord("r"): ord("\r"), ord("b"): 8, ord("f"): 12}
+
+
+class ArrivalParser:
+    def __init__(self, capacity=MAX_ARRIVALS):
+        self.capacity = capacity
+        self.arrivals = []
+        self.stack = bytearray(MAX_DEPTH)
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.unicode_left = 0
+        self.code = 0
+        self.is_key = False
+        self.expect_key = False
+        self.key = bytearray(MAX_KEY)
+        self.key_len = 0
+        self.text = bytearray(MAX_TEXT)
+        self.text_len = 0
+        self.field = -1       # which arrival field the current value is for
+        self.capture = 0      # 1 while reading a wanted string, 2 a wanted number
+        self.number = 0
+        self.negative = False
+        self.fraction = False
+        self.record = [None] * len(KEYS)
+
+    def feed(self, chunk):
+        for c in chunk:
+            if self.in_string:
+                self._string_byte(c)
+                continue
+
+            if self.capture == 2:
+                if 48 <= c <= 57:
+                    if not self.fraction:
+                        self.number = self.number * 10 + c - 48
+                    continue
+                if c == 46 or c == 101 or c == 69 or c == 43 or c == 45:  # . e E + -
+                    self.fraction = True
+                    continue
+                self.record[self.field] = -self.number if self.negative else self.number
+                self.capture = 0
+
+            if c == QUOTE:
+                self.in_string = True
+                self.is_key = self.expect_key
+                if self.is_key:
+                    self.key_len = 0
+                elif self.field >= 0 and self.depth == 2:
+                    self.capture = 1
+                    self.text_len = 0
+            elif c == 123:  # {
+                self._push(OBJECT)
+                self.expect_key = True
+                if self.depth == 2:
+                    for i in range(len(self.record)):
+                        self.record[i] = None
+            elif c == 91:  # [
+                self._push(ARRAY)
+                self.expect_key = False
+            elif c == 125 or c == 93:  # } ]
+                if c == 125 and self.depth == 2:
+                    self._add(self.record)
+                if self.depth > 0:
+                    self.depth -= 1
+                self.expect_key = False
+                self.field = -1
+            elif c == 58:  # :
+                self.expect_key = False
+            elif c == 44:  # ,
+                self.expect_key = self.depth > 0 and self.stack[self.depth - 1] == OBJECT
+                self.field = -1
+            elif (c == 45 or 48 <= c <= 57) and self.field >= 0 and self.depth == 2:
+                self.capture = 2
+                self.negative = c == 45
+                self.number = 0 if self.negative else c - 48
+                self.fraction = False
+
+    def _push(self, kind):
+        if self.depth < MAX_DEPTH:
+            self.stack[self.depth] = kind
+        self.depth += 1
+        self.field = -1
+
+    def _string_byte(self, c):
+        if self.unicode_left:
+            # \uXXXX: keep ASCII, anything else becomes ?
+            self.code = self.code * 16 + (c - 48 if c <= 57 else (c | 32) - 87)
+            self.unicode_left -= 1
+            if not self.unicode_left:
+                self._append(self.code if self.code < 128 else 63)
+            return
+        if self.escape:
+            self.escape = False
+            if c == 117:  # u
+                self.unicode_left = 4
+                self.code = 0
+            else:
+                self._append(ESCAPES.get(c, c))
+            return
+        if c == BACKSLASH:
+            self.escape = True
+        elif c == QUOTE:
+            self.in_string = False
+            if self.is_key:
+                self.field = -1
+                if self.depth == 2 and self.key_len <= MAX_KEY:
+                    self.field = KEYS.get(bytes(self.key[:self.key_len]), -1)
+            elif self.capture == 1:
+                self.record[self.field] = self._text()
+                self.capture = 0
+        else:
+            self._append(c)
+
+    def _append(self, c):
+        if self.is_key:
+            if self.key_len < MAX_KEY:
+                self.key[self.key_len] = c
+            self.key_len += 1  # one past MAX_KEY marks it as too long
+        elif self.capture == 1 and self.text_len < MAX_TEXT:
+            self.text[self.text_len] = c
+            self.text_len += 1
+
+    def _text(self):
+        text = self.text
+        n = self.text_len
+        if n == MAX_TEXT:
+            # don't cut a UTF-8 character in half
+            lead = n - 1
+            while lead > 0 and text[lead] & 0xC0 == 0x80:
+                lead -= 1
+            if text[lead] & 0x80:
+                length = 2 if text[lead] < 0xE0 else 3 if text[lead] < 0xF0 else 4
+                if n - lead < length:
+                    n = lead
+        return str(text[:n], "utf-8")
+
+    def _add(self, record):
+        if record[TIME_TO_STATION] is None:
+            return
+        arrival = tuple(record)
+        arrivals = self.arrivals
+        if len(arrivals) < self.capacity:
+            arrivals.append(arrival)
+            return
+        # full: replace the latest one if this is sooner
+        latest = 0
+        for i in range(1, len(arrivals)):
+            if arrivals[i][TIME_TO_STATION] > arrivals[latest][TIME_TO_STATION]:
+                latest = i
+        if arrival[TIME_TO_STATION] < arrivals[latest][TIME_TO_STATION]:
+            arrivals[latest] = arrival
+
+    def finish(self):
+        """The arrivals found, soonest first."""
+        self.arrivals.sort(key=lambda arrival: arrival[TIME_TO_STATION])
+        return self.arrivals
+
+
+def iso_seconds(text):
+    """Seconds into the day of an ISO 8601 time like 2024-03-09T14:02:11.4021633Z."""
+    return int(text[11:13]) * 3600 + int(text[14:16]) * 60 + int(text[17:19])
+
+
+def seconds_to_live(arrival):
+    """Seconds from the prediction being made until its timeToLive, or None if unknown."""
+    time_to_live = arrival[TIME_TO_LIVE]
+    timestamp = arrival[TIMESTAMP]
+    if time_to_live is None or timestamp is None:
+        return None
+    try:
+        return (iso_seconds(time_to_live) - iso_seconds(timestamp)) % 86400
+    except ValueError:
+        return None
+
+
+def read_arrivals(stream, capacity=MAX_ARRIVALS, chunk_size=CHUNK_SIZE):
+    """Parse arrivals from anything with readinto(), e.g. a urequests response's raw socket."""
+    parser = ArrivalParser(capacity)
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    while True:
+        n = stream.readinto(buffer)
+        if not n:
+            break
+        parser.feed(view[:n])
+    return parser.finish()
+
+
+def merge_arrivals(lists, count=MAX_ARRIVALS):
+    """The soonest count arrivals from several soonest-first lists, each vehicle only once."""
+    # a heap of the next arrival from each list: (time to station, list, index)
+    heap = [(arrivals[0][TIME_TO_STATION], i, 0) for i, arrivals in enumerate(lists) if arrivals]
+    heapq.heapify(heap)
+    merged = []
+    vehicles = set()
+    while heap and len(merged) < count:
+        _, i, j = heapq.heappop(heap)
+        arrival = lists[i][j]
+        vehicle = arrival[VEHICLE]
+        if vehicle is None or vehicle not in vehicles:
+            vehicles.add(vehicle)
+            merged.append(arrival)
+        j += 1
+        if j < len(lists[i]):
+            heapq.heappush(heap, (lists[i][j][TIME_TO_STATION], i, j))
+    return merged
+
+
+async def fetch_stop(stop_id, capacity=MAX_ARRIVALS, url=ARRIVALS_URL, timeout=STOP_TIMEOUT):
+    """One stop's arrivals, soonest first, or None if the request fails or times out."""
+    parser = ArrivalParser(capacity)
+    try:
+        status, _ = await ahttp.get_streamed(url.format(stop_id), parser.feed, timeout=timeout)
+    except Exception as e:
+        log.warning("Arrivals for %s failed: %r", stop_id, e)
+        return None
+    if status != 200:
+        log.warning("Arrivals for %s HTTP status %d", stop_id, status)
+        return None
+    return parser.finish()
+
+
+async def fetch_stops(stop_ids, count=MAX_ARRIVALS, concurrency=MAX_CONCURRENT,
+                      url=ARRIVALS_URL, timeout=STOP_TIMEOUT):
+    """The soonest count arrivals across all the stops, fetched concurrently.
+
+    Stops whose request fails are left out, but if every one fails this
+    returns None rather than [], which would mean no buses are due.
+    """
+    results = [None] * len(stop_ids)
+    next_stop = 0
+
+    async def worker():
+        nonlocal next_stop
+        while next_stop < len(stop_ids):
+            i = next_stop
+            next_stop += 1
+            results[i] = await fetch_stop(stop_ids[i], count, url, timeout)
+
+    await asyncio.gather(*[worker() for _ in range(min(concurrency, len(stop_ids)))])
+    if all(result is None for result in results):
+        return None
+    return merge_arrivals(results, count)
@@ -7,39 +7,37 @@
 # WIFI_SSID = "Your WiFi SSID"
 # WIFI_PASSWORD = "Your WiFi password"
 #
-# Clock synchronizes time on start, and resynchronizes if you press the A button
+# Clock synchronizes time on start, and resynchronizes if you press the A button.
+# The sleep button prints the recent log messages.
 
 import time
-import math
 import machine
 import network
 import ntptime
+import log
 from galactic import GalacticUnicorn
 from picographics import PicoGraphics, DISPLAY_GALACTIC_UNICORN as DISPLAY
+from pens import pen_cache
+from redraw import RedrawPlanner
+from gradient import GradientTable
 
 try:
     from secrets import WIFI_SSID, WIFI_PASSWORD
     wifi_available = True
 except ImportError:
-    print("Create secrets.py with your WiFi credentials to get time from NTP")
+    log.error("Create secrets.py with your WiFi credentials to get time from NTP")
     wifi_available = False
 
 
-# constants for controlling the background colour throughout the day
-MIDDAY_HUE = 1.1
-MIDNIGHT_HUE = 0.8
-HUE_OFFSET = -0.1
-
-MIDDAY_SATURATION = 1.0
-MIDNIGHT_SATURATION = 1.0
-
-MIDDAY_VALUE = 0.8
-MIDNIGHT_VALUE = 0.3
+# the background colours for every minute of the day, precomputed on flash
+# (the colours throughout the day are set in gradient.py)
+gradient = GradientTable()
 
 
 # create galactic object and graphics surface for drawing
 gu = GalacticUnicorn()
 graphics = PicoGraphics(DISPLAY)
+pens = pen_cache(graphics)
 
 # create the rtc object
 rtc = machine.RTC()
@@ -51,48 +49,23 @@ height = GalacticUnicorn.HEIGHT
 WHITE = graphics.create_pen(255, 255, 255)
 BLACK = graphics.create_pen(0, 0, 0)
 
+# remembers the drawn background and text so each second only redraws the
+# characters that changed
+planner = RedrawPlanner(graphics, width, height)
+
+
+def measure(text):
+    return graphics.measure_text(text, 1)
 
-@micropython.native  # noqa: F821
-def from_hsv(h, s, v):
-    i = math.floor(h * 6.0)
-    f = h * 6.0 - i
-    v *= 255.0
-    p = v * (1.0 - s)
-    q = v * (1.0 - f * s)
-    t = v * (1.0 - (1.0 - f) * s)
-
-    i = int(i) % 6
-    if i == 0:
-        return int(v), int(t), int(p)
-    if i == 1:
-        return int(q), int(v), int(p)
-    if i == 2:
-        return int(p), int(v), int(t)
-    if i == 3:
-        return int(p), int(q), int(v)
-    if i == 4:
-        return int(t), int(p), int(v)
-    if i == 5:
-        return int(v), int(p), int(q)
-
-
-# function for drawing a gradient background
-def gradient_background(start_hue, start_sat, start_val, end_hue, end_sat, end_val):
-    half_width = width // 2
-    for x in range(0, half_width):
-        hue = ((end_hue - start_hue) * (x / half_width)) + start_hue
-        sat = ((end_sat - start_sat) * (x / half_width)) + start_sat
-        val = ((end_val - start_val) * (x / half_width)) + start_val
-        colour = from_hsv(hue, sat, val)
-        graphics.set_pen(graphics.create_pen(int(colour[0]), int(colour[1]), int(colour[2])))
-        for y in range(0, height):
-            graphics.pixel(x, y)
-            graphics.pixel(width - x - 1, y)
-
-    colour = from_hsv(end_hue, end_sat, end_val)
-    graphics.set_pen(graphics.create_pen(int(colour[0]), int(colour[1]), int(colour[2])))
-    for y in range(0, height):
-        graphics.pixel(half_width, y)
+
+# function for drawing a gradient background from a row of the gradient
+# table: column x is drawn at x and mirrored at width - x - 1
+def gradient_background(colours):
+    for x in range(len(colours) // 3):
+        o = x * 3
+        graphics.set_pen(pens.pen(colours[o], colours[o + 1], colours[o + 2]))
+        graphics.rectangle(x, 0, 1, height)
+        graphics.rectangle(width - x - 1, 0, 1, height)
 
 
 # function for drawing outlined text
@@ -127,18 +100,18 @@ def sync_time():
         if wlan.status() < 0 or wlan.status() >= 3:
             break
         max_wait -= 1
-        print('waiting for connection...')
+        log.info('waiting for connection...', every=1000)
         time.sleep(0.2)
 
         redraw_display_if_reqd()
         gu.update(graphics)
 
     if max_wait > 0:
-        print("Connected")
+        log.info("Connected")
 
         try:
             ntptime.settime()
-            print("Time set")
+            log.info("Time set")
         except OSError:
             pass
 
@@ -181,17 +154,15 @@ def redraw_display_if_reqd():
     year, month, day, wd, hour, minute, second, _ = rtc.datetime()
     if second != last_second:
         hour += utc_offset
-        time_through_day = (((hour * 60) + minute) * 60) + second
-        percent_through_day = time_through_day / 86400
-        percent_to_midday = 1.0 - ((math.cos(percent_through_day * math.pi * 2) + 1) / 2)
-        print(percent_to_midday)
-
-        hue = ((MIDDAY_HUE - MIDNIGHT_HUE) * percent_to_midday) + MIDNIGHT_HUE
-        sat = ((MIDDAY_SATURATION - MIDNIGHT_SATURATION) * percent_to_midday) + MIDNIGHT_SATURATION
-        val = ((MIDDAY_VALUE - MIDNIGHT_VALUE) * percent_to_midday) + MIDNIGHT_VALUE
+        minute_of_day = hour * 60 + minute
+        colours = gradient.row(minute_of_day)
+        log.debug("percent to midday %f", gradient.percent_to_midday, every=60000)
 
-        gradient_background(hue, sat, val,
-                            hue + HUE_OFFSET, sat, val)
+        # the background only changes once a minute
+        planner.begin()
+        if planner.need_background(gradient.minute):
+            gradient_background(colours)
+            planner.save_background(gradient.minute)
 
         clock = "{:02}:{:02}:{:02}".format(hour, minute, second)
 
@@ -203,7 +174,14 @@ def redraw_display_if_reqd():
         x = int(width / 2 - w / 2 + 1)
         y = 2
 
-        outline_text(clock, x, y)
+        # put the background back under the characters that changed and
+        # redraw the text over just those columns
+        for x0, x1 in planner.changed_spans(clock, x, measure):
+            planner.restore(x0, x1)
+            graphics.set_clip(x0, 0, x1 - x0, height)
+            outline_text(clock, x, y)
+            graphics.remove_clip()
+        planner.end()
 
         last_second = second
 
@@ -212,6 +190,7 @@ gu.set_brightness(0.5)
 
 sync_time()
 
+dump_pressed = False
 while True:
     if gu.is_pressed(GalacticUnicorn.SWITCH_BRIGHTNESS_UP):
         gu.adjust_brightness(+0.01)
@@ -222,6 +201,11 @@ while True:
     if gu.is_pressed(GalacticUnicorn.SWITCH_A):
         sync_time()
 
+    if gu.is_pressed(GalacticUnicorn.SWITCH_SLEEP) != dump_pressed:
+        dump_pressed = not dump_pressed
+        if dump_pressed:
+            log.dump()
+
     redraw_display_if_reqd()
 
     # update the display
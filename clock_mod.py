@@ -54,12 +54,14 @@
 # then a sound will be played at the NTP_sync interval events.
 ##############
 import time, sys, os
-import math
 import machine
 import network
 import ntptime
 from galactic import GalacticUnicorn, Channel
 from picographics import PicoGraphics, DISPLAY_GALACTIC_UNICORN as DISPLAY
+from pens import pen_cache
+from redraw import RedrawPlanner
+from gradient import GradientTable
 
 try:
     from clock_mod_secrets import WIFI_SSID, WIFI_PASSWORD, COUNTRY, TZ_OFFSET, NTP_SERVER
@@ -93,20 +95,45 @@ use_sound = True
 if not classic:
     from clock_mod_digits import *
 
+# Glyph atlas: the string rows of each img_dict glyph compiled once into ints,
+# bit z set where column z is lit ('O'), plus the rows of its blinking caret
+# cells ('X') if it has any. char -> (lit rows, caret rows or None, width)
+glyphs = {}
+
+def compile_glyph(img):
+    lit = []
+    caret = []
+    for row in img:
+        lit_bits = 0
+        caret_bits = 0
+        for z in range(len(row)):
+            if row[z] == 'O':
+                lit_bits |= 1 << z
+            elif row[z] == 'X':
+                caret_bits |= 1 << z
+        lit.append(lit_bits)
+        caret.append(caret_bits)
+    return tuple(lit), (tuple(caret) if any(caret) else None)
+
+for ch in img_dict:
+    lit, caret = compile_glyph(img_dict[ch][0])
+    glyphs[ch] = (lit, caret, img_dict[ch][1])
+
+# What outline_text() last drew in each character cell, as
+# (char, column, fg pen, bg pen), so only cells that changed get redrawn.
+# None means the screen has been drawn over and everything needs redrawing.
+drawn_cells = None
+drawn_x = 0
+drawn_bg = None
+drawn_end = 0
+
 use_fixed_color = False
 
 vol_set = False
 
-# constants for controlling the background colour throughout the day
-MIDDAY_HUE = 1.1
-MIDNIGHT_HUE = 0.8
-HUE_OFFSET = -0.1
-
-MIDDAY_SATURATION = 1.0
-MIDNIGHT_SATURATION = 1.0
-
-MIDDAY_VALUE = 0.8
-MIDNIGHT_VALUE = 0.3
+# the background colours for every minute of the day, precomputed on flash
+# (the colours throughout the day are set in gradient.py)
+gradient = GradientTable()
 
 wlan = None
 
@@ -114,6 +141,7 @@ wlan = None
 gu = GalacticUnicorn()
 #gr = PicoGraphics(DISPLAY)
 gr = PicoGraphics(display=DISPLAY)
+pens = pen_cache(gr)
 
 button_a = machine.Pin(gu.SWITCH_A, machine.Pin.IN, machine.Pin.PULL_UP)
 button_b = machine.Pin(gu.SWITCH_B, machine.Pin.IN, machine.Pin.PULL_UP)
@@ -134,6 +162,13 @@ ptm = 0.0 # percentage-to-midday
 width = gu.WIDTH
 height = gu.HEIGHT
 
+# remembers the drawn background and text so each second only redraws the
+# characters that changed
+planner = RedrawPlanner(gr, width, height)
+
+def measure(text):
+    return gr.measure_text(text, 1)
+
 # See: https://www.rapidtables.com/web/color/index.html
 # set up some pens to use later
 BLACK = gr.create_pen(0, 0, 0)
@@ -249,57 +284,25 @@ def my_dev():
         print(TAG+f"dev_dict= {dev_dict}")
 
 def clear():
+    global drawn_cells
+    drawn_cells = None
+    planner.invalidate()
     gr.set_pen(BLACK)
     gr.clear()
     gu.update(gr)
 
-@micropython.native  # noqa: F821
-def from_hsv(h, s, v):
-    i = math.floor(h * 6.0)
-    f = h * 6.0 - i
-    v *= 255.0
-    p = v * (1.0 - s)
-    q = v * (1.0 - f * s)
-    t = v * (1.0 - (1.0 - f) * s)
-
-    i = int(i) % 6
-    if i == 0:
-        return int(v), int(t), int(p)
-    if i == 1:
-        return int(q), int(v), int(p)
-    if i == 2:
-        return int(p), int(v), int(t)
-    if i == 3:
-        return int(p), int(q), int(v)
-    if i == 4:
-        return int(t), int(p), int(v)
-    if i == 5:
-        return int(v), int(p), int(q)
-
-
-# function for drawing a gradient background
-def gradient_background(start_hue, start_sat, start_val, end_hue, end_sat, end_val):
-    half_width = width // 2
-    for x in range(0, half_width):
-        hue = ((end_hue - start_hue) * (x / half_width)) + start_hue
-        sat = ((end_sat - start_sat) * (x / half_width)) + start_sat
-        val = ((end_val - start_val) * (x / half_width)) + start_val
-        colour = from_hsv(hue, sat, val)
-        if classic:
-            gr.set_pen(gr.create_pen(int(colour[0]), int(colour[1]), int(colour[2])))
-        else:
-            gr.set_pen(gr.create_pen(0, 0, 0))  # mod by @PaulskPt
-        for y in range(0, height):
-            gr.pixel(x, y)
-            gr.pixel(width - x - 1, y)
-
-    colour = from_hsv(end_hue, end_sat, end_val)
-    if classic:
-        gr.set_pen(gr.create_pen(int(colour[0]), int(colour[1]), int(colour[2])))
-    else:
-        gr.set_pen(gr.create_pen(0, 0, 0))  # mod by @PaulskPt
-    for y in range(0, height):
-        gr.pixel(half_width, y)
+# function for drawing a gradient background from a row of the gradient
+# table: column x is drawn at x and mirrored at width - x - 1
+def gradient_background(colours):
+    if not classic:
+        gr.set_pen(BLACK)  # mod by @PaulskPt
+        gr.clear()
+        return
+    for x in range(len(colours) // 3):
+        o = x * 3
+        gr.set_pen(pens.pen(colours[o], colours[o + 1], colours[o + 2]))
+        gr.rectangle(x, 0, 1, height)
+        gr.rectangle(width - x - 1, 0, 1, height)
 
 # function for drawing outlined text
 
@@ -317,7 +320,7 @@ def outline_text(text, x: int=10, y: int=2, inv: int=0):
             fg = clr_dict[black_]
         else:
             fg = clr_dict[white_]
-        fg_pen = gr.create_pen(fg[0], fg[1], fg[2])
+        fg_pen = pens.pen(fg[0], fg[1], fg[2])
         gr.set_pen(fg_pen)
         gr.text(text, x - 1, y - 1, -1, 1)
         gr.text(text, x    , y - 1, -1, 1)
@@ -334,69 +337,86 @@ def outline_text(text, x: int=10, y: int=2, inv: int=0):
             fg = clr_dict[white_]
         else:
             fg = clr_dict[black_]
-        fg_pen = gr.create_pen(fg[0], fg[1], fg[2])
+        fg_pen = pens.pen(fg[0], fg[1], fg[2])
         gr.set_pen(fg_pen)
         gr.text(text, x, y, -1, 1)
         if vol_set:
             time.sleep(1)
     else:
-        img = None
         fg = clr_dict[clr_idx]
         if clr_dict_rev[clr_idx] == 'BLACK':
             bg = clr_dict[white_]
-            bg_pen = gr.create_pen(bg[0], bg[1], bg[2])
-            for i in range(x):
-                for j in range(height):
-                    gr.set_pen(bg_pen)
-                    gr.pixel(i, j)
         else:
             bg = clr_dict[black_]
-        fg_pen = gr.create_pen(fg[0], fg[1], fg[2])
-        bg_pen = gr.create_pen(bg[0], bg[1], bg[2])
-        gr.set_pen(fg_pen)
-        
-        le=len(text)    
-        col_ = x
-        width_ = 0
+        fg_pen = pens.pen(fg[0], fg[1], fg[2])
+        bg_pen = pens.pen(bg[0], bg[1], bg[2])
         time_ms = time.time_ns()//1000000  # convert nanosecond to millisecond - added by @PaulskPt
-        for _ in range(le):
-            if text[_][0] in img_dict:
-                img = img_dict[text[_]][0]
-                width_ = img_dict[text[_]][1]
-                #print(TAG+f"image= \'{text[_]}\'")
+        draw_cells(text, x, fg_pen, bg_pen, (time_ms // 300) % 2)
+
+# Draw text from the glyph atlas, redrawing only the character cells whose
+# glyph, position or colours changed since the last call. Each cell is the
+# glyph in fg/bg plus a black one column gap after it; the columns left and
+# right of the text are filled with bg.
+def draw_cells(text, x, fg_pen, bg_pen, caret_on):
+    global drawn_cells, drawn_x, drawn_bg, drawn_end
+    if drawn_cells is None or drawn_x != x or drawn_bg != bg_pen:
+        drawn_cells = []
+        drawn_end = width
+        gr.set_pen(bg_pen)
+        gr.rectangle(0, 0, x, height)
+        planner.touch(x * height)
+    drawn_x = x
+    drawn_bg = bg_pen
+
+    col_ = x
+    glyph = None
+    for i in range(len(text)):
+        ch = text[i]
+        if ch in glyphs:
+            glyph = glyphs[ch]
+        elif my_debug:
+            print(f"draw_cells(): key \'{ch}\' not in glyphs")
+        if glyph is None:
+            return  # nothing to draw yet
+        lit, caret, width_ = glyph
+
+        cell = (ch, col_, fg_pen, bg_pen)
+        if caret is not None or i >= len(drawn_cells) or drawn_cells[i] != cell:
+            blit_glyph(lit, caret if caret_on else None, width_, col_, fg_pen, bg_pen)
+            planner.touch((width_ + 1) * len(lit))
+            if i < len(drawn_cells):
+                drawn_cells[i] = cell
             else:
-                if my_debug:
-                    print(TAG+f"key \'{text[_]}\' not in img_dict")
+                drawn_cells.append(cell)
+        col_ += width_+1
+    del drawn_cells[len(text):]
+
+    # anything right of the text that isn't bg yet
+    if col_ < drawn_end:
+        gr.set_pen(bg_pen)
+        gr.rectangle(col_, 0, drawn_end - col_, height)
+        planner.touch((drawn_end - col_) * height)
+    drawn_end = col_
+
+@micropython.native  # noqa: F821
+def blit_glyph(lit, caret, width_, col_, fg_pen, bg_pen):
+    rows = len(lit)
+    gr.set_pen(bg_pen)
+    gr.rectangle(col_, 0, width_, rows)
+    gr.set_pen(BLACK)
+    gr.rectangle(col_ + width_, 0, 1, rows)
+    gr.set_pen(fg_pen)
+    for y in range(rows):
+        bits = lit[y]
+        if caret is not None:
+            bits |= caret[y]
+        z = col_
+        while bits:
+            if bits & 1:
+                gr.pixel(z, y)
+            bits >>= 1
+            z += 1
 
-            if img is None:
-                return
-            
-            for y in range(len(img)):
-                row = img[y]
-                for z in range(len(row)):
-                    pixel = row[z]
-                    # draw the prompt text
-                    if pixel == 'O':
-                        gr.set_pen(fg_pen)
-
-                    # draw the caret blinking
-                    elif pixel == 'X' and (time_ms // 300) % 2:
-                        gr.set_pen(fg_pen)
-                    else:
-                        gr.set_pen(bg_pen)                
-                    gr.pixel(col_+z, y)
-            col_ += width_+1
-            
-        if clr_dict_rev[clr_idx] == 'BLACK':
-            le = width - col_
-            bg = clr_dict[white_]
-            bg_pen = gr.create_pen(bg[0], bg[1], bg[2])
-            for i in range(le):
-                for j in range(height):
-                    gr.set_pen(bg_pen)
-                    gr.pixel(col_+i, j)
-        gu.update(gr)
-        
 # In the left-upper corner
 # blink a 2x2 square
 # to indicate:
@@ -404,14 +424,17 @@ def outline_text(text, x: int=10, y: int=2, inv: int=0):
 # WiFi disconnected:    red_
 # sync_time successful: blue_
 def blink(clr):
+    global drawn_cells
+    drawn_cells = None  # the clock gets redrawn in full next time
+    planner.invalidate()
     if my_debug:
         TAG= "blink():     "
         print(TAG+f"param= {clr_dict_rev[clr]}")
     if clr in clr_dict.keys():
         fg = clr_dict[clr]
         bg = clr_dict[black_]
-        fg_pen = gr.create_pen(fg[0], fg[1], fg[2])
-        bg_pen = gr.create_pen(bg[0], bg[1], bg[2])
+        fg_pen = pens.pen(fg[0], fg[1], fg[2])
+        bg_pen = pens.pen(bg[0], bg[1], bg[2])
         for h in range(3): # blink 3 times
             for i in range(2):  # horzontal
                 for j in range(2):  # vertical
@@ -580,19 +603,23 @@ def redraw_display_if_reqd():
     if second != last_second or time_chgd:
         if time_chgd:
             time_chgd = False
-        time_through_day = (((hour * 60) + minute) * 60) + second
-        percent_through_day = time_through_day / 86400
-        percent_to_midday = 1.0 - ((math.cos(percent_through_day * math.pi * 2) + 1) / 2)
+        colours = gradient.row(hour * 60 + minute)
+        percent_to_midday = gradient.percent_to_midday
         if second*1000 % 10 == 0:
             #print(percent_to_midday) # we don't need to show this percentage every second
             ptm = percent_to_midday
 
-        hue = ((MIDDAY_HUE - MIDNIGHT_HUE) * percent_to_midday) + MIDNIGHT_HUE
-        sat = ((MIDDAY_SATURATION - MIDNIGHT_SATURATION) * percent_to_midday) + MIDNIGHT_SATURATION
-        val = ((MIDDAY_VALUE - MIDNIGHT_VALUE) * percent_to_midday) + MIDNIGHT_VALUE
-
-        gradient_background(hue, sat, val,
-                            hue + HUE_OFFSET, sat, val)
+        # the background only changes once a minute
+        planner.begin()
+        if classic:
+            if planner.need_background(gradient.minute):
+                gradient_background(colours)
+                planner.save_background(gradient.minute)
+        elif drawn_cells is None:
+            # the non-classic background is plain black, so it only needs
+            # drawing when the digits are being redrawn in full
+            gradient_background(colours)
+            planner.touch(width * height)
 
         clock = "{:02}:{:02}:{:02}".format(hour, minute, second) # global var. Used sed in main() and hdg()
 
@@ -607,7 +634,19 @@ def redraw_display_if_reqd():
             x = 9
         y = 2
 
-        outline_text(clock, x, y)
+        if classic:
+            # put the background back under the characters that changed
+            # and redraw the text over just those columns
+            for x0, x1 in planner.changed_spans(clock, x, measure):
+                planner.restore(x0, x1)
+                gr.set_clip(x0, 0, x1 - x0, height)
+                outline_text(clock, x, y)
+                gr.remove_clip()
+        else:
+            outline_text(clock, x, y)  # only redraws the digits that changed
+        planner.end()
+        if my_debug:
+            print(f"redraw_display_if_reqd(): pixels touched= {planner.pixels_touched}")
         if vol_set:
             vol_set = False  # clear
 
@@ -726,13 +765,13 @@ def main():
                     
                 if gu.is_pressed(gu.SWITCH_VOLUME_UP):
                     text = "Vol Up"+' '+str(vol)
-                    gr.set_pen(gr.create_pen(0, 0, 0))
+                    gr.set_pen(pens.pen(0, 0, 0))
                     clear()
                     outline_text(text, x=5)
 
                 if gu.is_pressed(gu.SWITCH_VOLUME_DOWN):
                     text = "Vol Dn"+' '+str(vol)
-                    gr.set_pen(gr.create_pen(0, 0, 0))
+                    gr.set_pen(pens.pen(0, 0, 0))
                     clear()
                     outline_text(text, x=5)
 
@@ -752,7 +791,7 @@ def main():
                 text = "Reset..."
                 print("Going to reset...")
                 stop = True
-                gr.set_pen(gr.create_pen(0, 0, 0))
+                gr.set_pen(pens.pen(0, 0, 0))
                 clear()
                 outline_text(text)
     
@@ -0,0 +1,94 @@
+# colour.py - integer HSV to RGB conversion, shared by the effects
+#
+# from_hsv() used to be copied into each script as a float implementation.
+# Here hue is an integer number of HUE_STEPS per turn of the colour wheel (256
+# per sixth, so the sector and the position within it are a shift and a mask)
+# and saturation and value are 0 - 255, so a conversion is a few integer
+# multiplies and divides with no floats:
+#
+#   r, g, b = hsv_to_rgb(HUE_STEPS // 3, 255, 255)     # green
+#   r, g, b = from_hsv(0.5, 1.0, 0.8)                  # float arguments, as before
+#   hsv_row(buffer, 0, h0, h1, s, v, count)            # a hue gradient, as RGB bytes
+#   wheel = hue_wheel()                                # RGB bytes of 256 full colours
+#
+# Hues outside 0 - HUE_STEPS wrap round. host/check_colour.py compares these
+# with the old float version and times them.
+
+HUE_STEPS = 6 * 256
+WHEEL_STEPS = 256
+
+
+@micropython.native  # noqa: F821
+def hsv_to_rgb(h, s, v):
+    """(r, g, b) for hue h in HUE_STEPS, saturation s and value v 0 - 255."""
+    h %= HUE_STEPS
+    f = h & 0xFF
+    p = v * (255 - s) // 255
+    q = v * (65280 - f * s) // 65280
+    t = v * (65280 - (256 - f) * s) // 65280
+
+    sector = h >> 8
+    if sector == 0:
+        return v, t, p
+    if sector == 1:
+        return q, v, p
+    if sector == 2:
+        return p, v, t
+    if sector == 3:
+        return p, q, v
+    if sector == 4:
+        return t, p, v
+    return v, p, q
+
+
+def from_hsv(h, s, v):
+    """(r, g, b) 0 - 255 for h, s and v as floats 0.0 - 1.0, like the old float from_hsv()."""
+    return hsv_to_rgb(int(h * HUE_STEPS), int(s * 255 + 0.5), int(v * 255 + 0.5))
+
+
+@micropython.native  # noqa: F821
+def hsv_row(buffer, offset, h0, h1, s, v, count):
+    """Write count RGB colours from hue h0 to h1 (inclusive) into buffer at offset."""
+    # hsv_to_rgb() inlined, as this is the loop that matters
+    span = h1 - h0
+    last = max(count - 1, 1)
+    p = v * (255 - s) // 255
+    o = offset
+    for i in range(count):
+        h = (h0 + span * i // last) % HUE_STEPS
+        f = h & 0xFF
+        sector = h >> 8
+        if sector & 1:
+            # sectors 1, 3 and 5 fall from v
+            x = v * (65280 - f * s) // 65280
+        else:
+            # sectors 0, 2 and 4 rise to v
+            x = v * (65280 - (256 - f) * s) // 65280
+        if sector == 0:
+            r, g, b = v, x, p
+        elif sector == 1:
+            r, g, b = x, v, p
+        elif sector == 2:
+            r, g, b = p, v, x
+        elif sector == 3:
+            r, g, b = p, x, v
+        elif sector == 4:
+            r, g, b = x, p, v
+        else:
+            r, g, b = v, p, x
+        buffer[o] = r
+        buffer[o + 1] = g
+        buffer[o + 2] = b
+        o += 3
+
+
+_wheels = {}
+
+
+def hue_wheel(steps=WHEEL_STEPS):
+    """RGB bytes of steps fully saturated, full value colours round the wheel, made once."""
+    wheel = _wheels.get(steps)
+    if wheel is None:
+        wheel = _wheels[steps] = bytearray(3 * steps)
+        hsv_row(wheel, 0, 0, HUE_STEPS - HUE_STEPS // steps, 255, 255, steps)
+    return wheel
@@ -7,7 +7,7 @@
 # - main.py exists
 # Then:
 # - Connects to the Pico W
-# - Uploads main.py and local_secrets.py
+# - Uploads main.py, its helper modules and local_secrets.py
 # - Resets the board
 # 
 # Usage: ./deploy.sh
@@ -43,6 +43,10 @@ if mpremote connect $PORT exec "print('Connected')" >/dev/null 2>&1; then
 
     echo -e "${BLUE}📤 Uploading files...${NC}"
     mpremote connect $PORT fs cp main.py :main.py
+    mpremote connect $PORT fs cp ahttp.py :ahttp.py
+    mpremote connect $PORT fs cp pens.py :pens.py
+    mpremote connect $PORT fs cp log.py :log.py
+    mpremote connect $PORT fs cp mqtt_as.py :mqtt_as.py
     mpremote connect $PORT fs cp local_secrets.py :local_secrets.py
     echo -e "${GREEN}✅ Files uploaded.${NC}"
     echo ""
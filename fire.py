@@ -1,19 +1,34 @@
 import time, random
+from array import array
 from galactic import GalacticUnicorn
+from framebuffer import ShadowFramebuffer
 
 graphics = None
 palette = None
+heat_colours = None
+fb = None
 
 # setup heat value buffer and fire parameters
+#
+# The heat field is one flat array in row-major order (index = y * width + x)
+# holding 12 bit fixed-point values, where HEAT_MAX is 1.0. Moving down a row
+# is just adding width to the index.
 width = GalacticUnicorn.WIDTH + 2
 height = GalacticUnicorn.HEIGHT + 4
-heat = [[0.0 for y in range(height)] for x in range(width)]
+heat = array('H', bytes(2 * width * height))
 fire_spawns = 5
 damping_factor = 0.97
 
+HEAT_MAX = 4095
+HEAT_SHIFT = 4  # heat >> HEAT_SHIFT indexes the 256 entry heat_colours table
+
+# averaging the five cells and damping, folded into one multiply and shift:
+# (sum * DAMPING) >> 10 == sum / 5.0 * damping_factor
+DAMPING = int(damping_factor / 5.0 * 1024 + 0.5)
+
 def init():
     # a palette of five firey colours (white, yellow, orange, red, smoke)
-    global palette
+    global palette, heat_colours, fb
     palette = [
         graphics.create_pen(  0,   0,   0),
         graphics.create_pen( 20,  20,  20),
@@ -21,56 +36,63 @@ def init():
         graphics.create_pen(220, 160,   0),
         graphics.create_pen(255, 255, 180)
     ]
+    # look up table from (heat >> HEAT_SHIFT) to palette index
+    heat_colours = bytearray(index_from_value(i / 256) for i in range(256))
 
-# returns the palette entry for a given heat value
-@micropython.native  # noqa: F821
-def pen_from_value(value):
+    # only the pixels whose colour changed get redrawn each frame
+    fb = ShadowFramebuffer(graphics, GalacticUnicorn.WIDTH, GalacticUnicorn.HEIGHT)
+    fb.set_palette(palette)
+
+# returns the palette index for a given heat value (0.0 - 1.0)
+def index_from_value(value):
     if value < 0.15:
-        return palette[0]
+        return 0
     elif value < 0.25:
-        return palette[1]
+        return 1
     elif value < 0.35:
-        return palette[2]
+        return 2
     elif value < 0.45:
-        return palette[3]
-    return palette[4]
+        return 3
+    return 4
 
 @micropython.native  # noqa: F821
-def draw():        
+def draw():
+    w = width
+    bottom = (height - 2) * w
+
     # clear the the rows off the bottom of the display
-    for x in range(width):
-        heat[x][height - 1] = 0.0
-        heat[x][height - 2] = 0.0
-        
+    for i in range(bottom, bottom + 2 * w):
+        heat[i] = 0
+
     # add new fire spawns
     for c in range(fire_spawns):
-        x = random.randint(0, width - 4) + 2
-        heat[x + 0][height - 1] = 1.0
-        heat[x + 1][height - 1] = 1.0
-        heat[x - 1][height - 1] = 1.0
-        heat[x + 0][height - 2] = 1.0
-        heat[x + 1][height - 2] = 1.0
-        heat[x - 1][height - 2] = 1.0
+        i = bottom + random.randint(0, w - 4) + 2
+        heat[i - 1] = HEAT_MAX
+        heat[i] = HEAT_MAX
+        heat[i + 1] = HEAT_MAX
+        heat[i + w - 1] = HEAT_MAX
+        heat[i + w] = HEAT_MAX
+        heat[i + w + 1] = HEAT_MAX
 
-    # average and damp out each value to create rising flame effect
+    # average and damp out each value to create rising flame effect; each
+    # cell takes itself, the two below it and its two diagonal neighbours
     for y in range(0, height - 2):
-        for x in range(1, width - 1):
-            # update this pixel by averaging the below pixels
-            average = (
-                heat[x][y] + heat[x][y + 1] + heat[x][y + 2] + heat[x - 1][y + 1] + heat[x + 1][y + 1]
-            ) / 5.0
+        row = y * w
+        for i in range(row + 1, row + w - 1):
+            below = i + w
+            heat[i] = ((heat[i] + heat[below] + heat[below + w] + heat[below - 1] + heat[below + 1]) * DAMPING) >> 10
 
-            # damping factor to ensure flame tapers out towards the top of the displays
-            average *= damping_factor
-
-            # update the heat map with our newly averaged value
-            heat[x][y] = average
-           
-    # render the heat values to the graphics buffer
+    # render the heat values to the shadow framebuffer, which sends only the
+    # changed pixels to graphics
+    colours = heat_colours
+    back = fb.back
+    o = 0
     for y in range(GalacticUnicorn.HEIGHT):
+        row = y * w + 1
         for x in range(GalacticUnicorn.WIDTH):
-            graphics.set_pen(pen_from_value(heat[x + 1][y]))
-            graphics.pixel(x, y)
-            
+            back[o] = colours[heat[row + x] >> HEAT_SHIFT]
+            o += 1
+    fb.flush()
+
 def test():
-    print("A")
\ No newline at end of file
+    print("A")
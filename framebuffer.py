@@ -0,0 +1,108 @@
+# framebuffer.py - palette-indexed shadow framebuffer with dirty-pixel diffing
+#
+# Effects normally set_pen() + pixel() every one of the 583 pixels every
+# frame, even the ones that haven't changed. Instead an effect can write
+# palette indexes into ShadowFramebuffer.back (one byte per pixel, row-major)
+# and call flush(), which compares against what was sent last time and only
+# draws the pixels that changed, grouped by pen so each pen is set once.
+#
+#   fb = ShadowFramebuffer(graphics, width, height)
+#   fb.set_palette([black_pen, red_pen, ...])   # up to 255 pens
+#   fb.back[y * width + x] = 1
+#   fb.flush()
+#
+# flush() assumes nothing else draws on graphics in between. If something
+# does (or the effect is switched back in), call invalidate() so the next
+# flush() redraws every pixel.
+
+from array import array
+
+UNKNOWN = 255  # front buffer value meaning "we don't know what is on screen"
+
+
+class ShadowFramebuffer:
+    def __init__(self, graphics, width, height):
+        self.graphics = graphics
+        self.width = width
+        self.height = height
+        self.size = width * height
+        self.pens = []
+        self.back = bytearray(self.size)                  # what the effect wants shown
+        self.front = bytearray(b"\xff" * self.size)       # what was last sent to graphics
+        self._changed = array('H', bytes(2 * self.size))  # offsets of changed pixels
+        self._order = array('H', bytes(2 * self.size))    # the same, grouped by pen
+        self._counts = array('H', bytes(2 * 256))
+        # for checking how much work flush() saves
+        self.pixels_written = 0
+        self.pen_changes = 0
+
+    def set_palette(self, pens):
+        if len(pens) >= UNKNOWN:
+            raise ValueError("palette is limited to 255 pens")
+        self.pens = list(pens)
+        self.invalidate()
+
+    def invalidate(self):
+        for i in range(self.size):
+            self.front[i] = UNKNOWN
+
+    def clear(self, index=0):
+        back = self.back
+        for i in range(self.size):
+            back[i] = index
+
+    def pixel(self, x, y, index):
+        self.back[y * self.width + x] = index
+
+    @micropython.native  # noqa: F821
+    def flush(self):
+        """Draw the pixels that changed since the last flush; returns how many."""
+        back = self.back
+        front = self.front
+        changed = self._changed
+        order = self._order
+        counts = self._counts
+        npens = len(self.pens)
+
+        for p in range(npens):
+            counts[p] = 0
+
+        # find the changed pixels and count how many use each pen
+        n = 0
+        for i in range(self.size):
+            v = back[i]
+            if v != front[i]:
+                front[i] = v
+                changed[n] = i
+                n += 1
+                counts[v] += 1
+        if n == 0:
+            return 0
+
+        # counting sort the changed pixels by pen
+        start = 0
+        for p in range(npens):
+            c = counts[p]
+            counts[p] = start
+            start += c
+        for k in range(n):
+            i = changed[k]
+            v = back[i]
+            order[counts[v]] = i
+            counts[v] += 1
+
+        graphics = self.graphics
+        pens = self.pens
+        width = self.width
+        last = -1
+        for k in range(n):
+            i = order[k]
+            v = back[i]
+            if v != last:
+                graphics.set_pen(pens[v])
+                last = v
+                self.pen_changes += 1
+            graphics.pixel(i % width, i // width)
+
+        self.pixels_written += n
+        return n
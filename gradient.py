@@ -0,0 +1,108 @@
+# gradient.py - the clocks' background gradient for every minute of the day
+#
+# The clock background is a pure function of the time of day: percent_to_midday
+# comes from a cosine of it, that sets a hue/saturation/value, and each column
+# is an HSV to RGB conversion along a hue range. Rather than doing that float
+# maths every second, it is done once for each of the 1440 minutes of the day
+# and written to a file on flash. The clocks then read one row a minute:
+#
+#   table = GradientTable()
+#   colours = table.row(hour * 60 + minute)   # RGB bytes for COLUMNS columns
+#   table.percent_to_midday                   # for that minute, 0.0 - 1.0
+#
+# Column x of a row is drawn at x and at width - 1 - x; the last column is the
+# centre one. Each row is a little-endian uint16 percent_to_midday (0 - 65535)
+# followed by the RGB bytes, after a short header holding the settings the
+# table was built with. If the file is missing or was built with different
+# settings it is rebuilt, which takes a while on the Pico, so it is better to
+# build it on a computer and copy it over:
+#
+#   python3 host/emulator.py --script gradient.py
+#   mpremote fs cp clock_gradient.bin :clock_gradient.bin
+
+import math
+import struct
+from colour import hsv_row, HUE_STEPS
+
+GRADIENT_FILE = "clock_gradient.bin"
+MAGIC = b"CGR2"
+MINUTES = 24 * 60
+COLUMNS = 27  # half the 53 column display plus the centre column
+ROW_BYTES = 2 + COLUMNS * 3
+
+# settings for the background colour throughout the day
+MIDDAY_HUE = 1.1
+MIDNIGHT_HUE = 0.8
+HUE_OFFSET = -0.1
+
+MIDDAY_SATURATION = 1.0
+MIDNIGHT_SATURATION = 1.0
+
+MIDDAY_VALUE = 0.8
+MIDNIGHT_VALUE = 0.3
+
+
+def header():
+    settings = (MIDDAY_HUE, MIDNIGHT_HUE, HUE_OFFSET, MIDDAY_SATURATION, MIDNIGHT_SATURATION,
+                MIDDAY_VALUE, MIDNIGHT_VALUE)
+    return MAGIC + struct.pack("<7h", *[int(round(setting * 1000)) for setting in settings])
+
+
+def build_row(minute, row):
+    percent_through_day = minute / MINUTES
+    percent_to_midday = 1.0 - ((math.cos(percent_through_day * math.pi * 2) + 1) / 2)
+
+    start_hue = ((MIDDAY_HUE - MIDNIGHT_HUE) * percent_to_midday) + MIDNIGHT_HUE
+    sat = ((MIDDAY_SATURATION - MIDNIGHT_SATURATION) * percent_to_midday) + MIDNIGHT_SATURATION
+    val = ((MIDDAY_VALUE - MIDNIGHT_VALUE) * percent_to_midday) + MIDNIGHT_VALUE
+    end_hue = start_hue + HUE_OFFSET
+
+    struct.pack_into("<H", row, 0, int(percent_to_midday * 65535 + 0.5))
+    # the gradient runs across the columns up to the centre one, which is the
+    # end colour
+    hsv_row(row, 2, int(start_hue * HUE_STEPS), int(end_hue * HUE_STEPS),
+            int(sat * 255 + 0.5), int(val * 255 + 0.5), COLUMNS)
+
+
+def build(path=GRADIENT_FILE):
+    row = bytearray(ROW_BYTES)
+    with open(path, "wb") as f:
+        f.write(header())
+        for minute in range(MINUTES):
+            build_row(minute, row)
+            f.write(row)
+
+
+class GradientTable:
+    def __init__(self, path=GRADIENT_FILE):
+        expected = header()
+        try:
+            with open(path, "rb") as f:
+                ok = f.read(len(expected)) == expected
+        except OSError:
+            ok = False
+        if not ok:
+            print("Building", path)
+            build(path)
+
+        self.file = open(path, "rb")
+        self.offset = len(expected)
+        self.buffer = bytearray(ROW_BYTES)
+        self.colours = memoryview(self.buffer)[2:]
+        self.minute = None
+        self.percent_to_midday = 0.0
+
+    def row(self, minute):
+        """RGB bytes of each column for a minute of the day (read from flash when the minute changes)."""
+        minute %= MINUTES
+        if minute != self.minute:
+            self.file.seek(self.offset + minute * ROW_BYTES)
+            self.file.readinto(self.buffer)
+            self.percent_to_midday = (self.buffer[0] | self.buffer[1] << 8) / 65535
+            self.minute = minute
+        return self.colours
+
+
+if __name__ == "__main__":
+    build()
+    print("Wrote", GRADIENT_FILE)
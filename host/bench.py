@@ -0,0 +1,201 @@
+# bench.py - frame-time benchmarks for every effect, run on the emulator
+#
+# Finds each module in the repo that follows main_choose.py's effect contract
+# (a module-level graphics plus init() and draw()), draws it N times against
+# the emulated display and reports per effect:
+#   - mean / p50 / p99 draw() time
+#   - heap allocations per frame, counted in a separate traced pass so it
+#     doesn't skew the timings: the rise in CPython's allocated block count
+#     is summed over each line the effect runs, so temporaries freed again
+#     still count, roughly the churn a MicroPython heap would see (CPython
+#     also boxes ints above 256, which MicroPython doesn't). Allocations
+#     inside the emulator's stand-ins aren't counted, only the effect's own
+#   - gc collections during the timed frames
+#   - PicoGraphics calls per frame (create_pen, set_pen, pixel, circle, ...),
+#     with draws the total of the drawing calls
+#
+#   python3 host/bench.py                       # all effects, table
+#   python3 host/bench.py fire rainbow --frames 500
+#   python3 host/bench.py --json results.json   # - for stdout
+#   python3 host/bench.py --baseline results.json --tolerance 0.2
+#
+# With --baseline, exits non-zero if any effect's mean frame time is more than
+# tolerance (a fraction) slower than in the saved results.
+
+import ast
+import gc
+import json
+import os
+import sys
+import time
+
+import emulator
+
+
+def find_effects():
+    """Names of the modules in the repo that define top-level init() and draw()."""
+    effects = []
+    for filename in sorted(os.listdir(emulator.REPO_DIR)):
+        if not filename.endswith(".py"):
+            continue
+        with open(os.path.join(emulator.REPO_DIR, filename)) as f:
+            try:
+                tree = ast.parse(f.read())
+            except SyntaxError:
+                continue
+        functions = {node.name for node in tree.body if isinstance(node, ast.FunctionDef)}
+        if {"init", "draw"} <= functions:
+            effects.append(filename[:-3])
+    return effects
+
+
+def percentile(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p))]
+
+
+DRAW_CALLS = ("pixel", "pixel_span", "clear", "rectangle", "circle", "line", "text")
+
+
+def allocation_tracer(counter):
+    """A sys.settrace function adding to counter[0] the blocks allocated by code in the repo.
+
+    counter[1] holds the block count at the last event and must be set before
+    tracing starts. Frames outside the repo (the stand-ins, the standard
+    library) only move the reading on, so what they allocate isn't counted.
+    """
+    allocated_blocks = sys.getallocatedblocks
+    host_dir = emulator.HOST_DIR + os.sep
+
+    def count(frame, event, arg):
+        blocks = allocated_blocks()
+        if blocks > counter[1]:
+            counter[0] += blocks - counter[1]
+        counter[1] = blocks
+        return count
+
+    def skip(frame, event, arg):
+        counter[1] = allocated_blocks()
+        return skip
+
+    def on_call(frame, event, arg):
+        filename = frame.f_code.co_filename
+        if filename.startswith(emulator.REPO_DIR) and not filename.startswith(host_dir):
+            return count(frame, event, arg)
+        count(frame, event, arg)  # what the caller allocated up to the call
+        return skip
+
+    return on_call
+
+
+def bench_effect(name, frames, seed):
+    from picographics import PicoGraphics, DISPLAY_GALACTIC_UNICORN
+    import random
+
+    random.seed(seed)
+    graphics = PicoGraphics(DISPLAY_GALACTIC_UNICORN)
+    effect = emulator.load_effect(name, graphics)
+
+    # warm up, so one-off setup doesn't count
+    for _ in range(min(10, frames)):
+        effect.draw()
+
+    # timing pass
+    collections = [0]
+
+    def on_gc(phase, info):
+        if phase == "start":
+            collections[0] += 1
+
+    for key in graphics.counts:
+        graphics.counts[key] = 0
+    times = []
+    gc.collect()
+    gc.callbacks.append(on_gc)
+    try:
+        for _ in range(frames):
+            start = time.perf_counter()
+            effect.draw()
+            times.append(time.perf_counter() - start)
+    finally:
+        gc.callbacks.remove(on_gc)
+    calls = {key: value / frames for key, value in graphics.counts.items()}
+
+    # allocation pass
+    counter = [0, 0]
+    tracer = allocation_tracer(counter)
+    counter[1] = sys.getallocatedblocks()
+    sys.settrace(tracer)
+    try:
+        for _ in range(frames):
+            effect.draw()
+    finally:
+        sys.settrace(None)
+
+    times.sort()
+    return {
+        "frames": frames,
+        "mean_ms": sum(times) / frames * 1000,
+        "p50_ms": percentile(times, 0.50) * 1000,
+        "p99_ms": percentile(times, 0.99) * 1000,
+        "fps": frames / sum(times),
+        "allocs_per_frame": counter[0] / frames,
+        "gc_collections": collections[0],
+        "calls_per_frame": calls,
+        "draw_calls_per_frame": sum(calls[key] for key in DRAW_CALLS if key in calls),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Effects whose mean frame time regressed by more than tolerance."""
+    regressions = []
+    for name, result in results.items():
+        if name in baseline:
+            before = baseline[name]["mean_ms"]
+            if result["mean_ms"] > before * (1 + tolerance):
+                regressions.append((name, before, result["mean_ms"]))
+    return regressions
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the effects on the emulator")
+    parser.add_argument("effects", nargs="*", help="effect modules (default: all found)")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", metavar="FILE", help="write results as JSON (- for stdout)")
+    parser.add_argument("--baseline", metavar="FILE", help="JSON results to check for regressions against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    emulator.install(fast=True)
+    names = args.effects or find_effects()
+    results = {name: bench_effect(name, args.frames, args.seed) for name in names}
+
+    if args.json == "-":
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        print(f"{'effect':<16}{'mean ms':>9}{'p50 ms':>9}{'p99 ms':>9}{'fps':>9}{'allocs':>8}{'gc':>5}"
+              f"{'pens':>8}{'set_pen':>9}{'draws':>8}{'pixel':>8}{'circle':>8}")
+        for name, r in results.items():
+            c = r["calls_per_frame"]
+            print(f"{name:<16}{r['mean_ms']:>9.3f}{r['p50_ms']:>9.3f}{r['p99_ms']:>9.3f}{r['fps']:>9.1f}"
+                  f"{r['allocs_per_frame']:>8.0f}{r['gc_collections']:>5}"
+                  f"{c['create_pen']:>8.0f}{c['set_pen']:>9.0f}{r['draw_calls_per_frame']:>8.0f}"
+                  f"{c['pixel']:>8.0f}{c['circle']:>8.0f}")
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: {before:.3f}ms -> {after:.3f}ms", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
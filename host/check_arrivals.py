@@ -0,0 +1,226 @@
+# check_arrivals.py - check arrivals.py's streaming parser against json
+#
+# Feeds each sample TfL arrivals payload in host/fixtures/ through
+# arrivals.read_arrivals() with a range of chunk sizes (down to one byte, so
+# every token gets split somewhere) and compares the result with the same
+# fields pulled out of json.loads(). The samples follow the TfL response
+# format; one nests a timeToStation inside "timing", which must be ignored,
+# and tfl_arrivals_utf8.json has destinations whose 40th byte ends, or falls
+# inside, a 2, 3 or 4 byte UTF-8 character.
+#
+# It then parses generated responses of 10 to 2000 arrivals under
+# tracemalloc to show peak memory doesn't grow with the response, and fetches
+# several stops from a local stand-in for the TfL API (one slow enough to time
+# out, one missing) to check fetch_stops() merges them soonest first with each
+# vehicle once, keeps to its concurrency limit and doesn't wait on the slow one,
+# and that it returns None, not an empty board, when no stop answers.
+#
+#   python3 host/check_arrivals.py
+
+import asyncio
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import emulator
+
+FIXTURES_DIR = os.path.join(emulator.HOST_DIR, "fixtures")
+CHUNK_SIZES = (1, 2, 3, 7, 64, 256, 4096)
+
+
+def expected_arrivals(payload, capacity):
+    """What the parser should find in a payload: json's values, trimmed the way the parser trims them."""
+    import arrivals
+
+    def text(value, escaped):
+        if escaped:
+            # \uXXXX escapes of non-ASCII characters come out as ?
+            value = "".join(c if ord(c) < 128 else "?" for c in value)
+        data = value.encode()
+        if len(data) > arrivals.MAX_TEXT:
+            data = data[:arrivals.MAX_TEXT].decode(errors="ignore").encode()
+        return data.decode()
+
+    escaped = payload.isascii()
+    data = json.loads(payload)
+    if not isinstance(data, list):
+        return []
+    found = []
+    for bus in data:
+        if "timeToStation" not in bus:
+            continue
+        found.append((bus["timeToStation"], text(bus["lineName"], escaped),
+                      text(bus["destinationName"], escaped), text(bus["platformName"], escaped),
+                      text(bus["timeToLive"], escaped), text(bus["timestamp"], escaped),
+                      text(bus["vehicleId"], escaped)))
+    found.sort(key=lambda arrival: arrival[arrivals.TIME_TO_STATION])
+    return found[:capacity]
+
+
+def check_fixtures():
+    import arrivals
+
+    failures = 0
+    for filename in sorted(os.listdir(FIXTURES_DIR)):
+        if not filename.endswith(".json"):
+            continue
+        with open(os.path.join(FIXTURES_DIR, filename), "rb") as f:
+            payload = f.read()
+        for capacity in (arrivals.MAX_ARRIVALS, 3):
+            expected = expected_arrivals(payload.decode(), capacity)
+            for chunk_size in CHUNK_SIZES:
+                got = arrivals.read_arrivals(io.BytesIO(payload), capacity, chunk_size)
+                if got != expected:
+                    failures += 1
+                    print(f"MISMATCH {filename} capacity {capacity} chunk {chunk_size}:\n"
+                          f"  got      {got}\n  expected {expected}", file=sys.stderr)
+        print(f"{filename}: {len(expected_arrivals(payload.decode(), arrivals.MAX_ARRIVALS))} arrivals")
+    return failures
+
+
+def generated_payload(count):
+    with open(os.path.join(FIXTURES_DIR, "tfl_arrivals.json")) as f:
+        sample = json.load(f)
+    buses = []
+    for i in range(count):
+        bus = dict(sample[i % len(sample)])
+        bus["timeToStation"] = (i * 7919) % 3600
+        buses.append(bus)
+    return json.dumps(buses, separators=(",", ":")).encode()
+
+
+def check_memory():
+    import arrivals
+
+    for count in (10, 100, 500, 2000):
+        stream = io.BytesIO(generated_payload(count))
+        tracemalloc.start()
+        try:
+            arrivals.read_arrivals(stream)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        print(f"{count:>5} arrivals, {len(stream.getvalue()):>8} byte response: peak {peak} bytes while parsing")
+
+
+# stop id: (fixture, seconds before answering)
+STOPS = {
+    "490007732N": ("tfl_arrivals.json", 0.3),
+    "490007732S": ("tfl_arrivals_stop2.json", 0.3),
+    "490007732E": ("tfl_arrivals_empty.json", 0.3),
+    "SLOW": ("tfl_arrivals.json", 5),
+}
+FETCH_TIMEOUT = 1
+
+
+async def serve_stops(stops, open_requests):
+    """A local HTTP server answering /StopPoint/<id>/arrivals from the fixtures."""
+    async def handle(reader, writer):
+        open_requests[0] += 1
+        open_requests[1] = max(open_requests[1], open_requests[0])
+        try:
+            path = (await reader.readline()).split()[1].decode()
+            while (await reader.readline()) not in (b"\r\n", b""):
+                pass
+            stop_id = path.split("/")[2]
+            if stop_id not in stops:
+                writer.write(b"HTTP/1.0 404 Not Found\r\n\r\n")
+                return
+            filename, delay = stops[stop_id]
+            try:
+                # wait before answering, unless the client gives up first
+                await asyncio.wait_for(reader.read(1), delay)
+                return
+            except asyncio.TimeoutError:
+                pass
+            with open(os.path.join(FIXTURES_DIR, filename), "rb") as f:
+                writer.write(b"HTTP/1.0 200 OK\r\nContent-Type: application/json\r\n\r\n" + f.read())
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            open_requests[0] -= 1
+            writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+
+def expected_merge(stop_ids, count):
+    """All the stops' arrivals soonest first, each vehicle once, done the slow way."""
+    import arrivals
+
+    found = []
+    for stop_id in stop_ids:
+        if stop_id in STOPS and STOPS[stop_id][1] < FETCH_TIMEOUT:
+            with open(os.path.join(FIXTURES_DIR, STOPS[stop_id][0])) as f:
+                found += expected_arrivals(f.read(), arrivals.MAX_ARRIVALS)
+    found.sort(key=lambda arrival: arrival[arrivals.TIME_TO_STATION])
+    merged = []
+    for arrival in found:
+        if all(arrival[arrivals.VEHICLE] != seen[arrivals.VEHICLE] for seen in merged):
+            merged.append(arrival)
+    return merged[:count]
+
+
+async def check_fetch():
+    import arrivals
+
+    failures = 0
+    open_requests = [0, 0]  # now, most at once
+    server = await serve_stops(STOPS, open_requests)
+    url = "http://127.0.0.1:%d/StopPoint/{}/arrivals" % server.sockets[0].getsockname()[1]
+    stop_ids = list(STOPS) + ["MISSING"]
+    async with server:
+        for concurrency in (1, 2, len(stop_ids)):
+            for count in (arrivals.MAX_ARRIVALS, 5):
+                open_requests[1] = 0
+                start = time.monotonic()
+                got = await arrivals.fetch_stops(stop_ids, count, concurrency, url, FETCH_TIMEOUT)
+                seconds = time.monotonic() - start
+                expected = expected_merge(stop_ids, count)
+                if got != expected:
+                    failures += 1
+                    print(f"MISMATCH fetching {stop_ids} concurrency {concurrency} count {count}:\n"
+                          f"  got      {got}\n  expected {expected}", file=sys.stderr)
+                if open_requests[1] > concurrency:
+                    failures += 1
+                    print(f"{open_requests[1]} requests open at once, limit {concurrency}", file=sys.stderr)
+                if count == arrivals.MAX_ARRIVALS:
+                    print(f"{len(stop_ids)} stops, {concurrency} at a time: {len(got)} arrivals "
+                          f"in {seconds:.1f}s, at most {open_requests[1]} open at once")
+
+        # a failed fetch mustn't look like a stop with no buses due
+        failed = ["MISSING", "MISSING"]
+        got = await arrivals.fetch_stops(failed, url=url, timeout=FETCH_TIMEOUT)
+        if got is not None:
+            failures += 1
+            print(f"fetching {failed} gave {got}, expected None", file=sys.stderr)
+        got = await arrivals.fetch_stops(["A", "B"], url="http://127.0.0.1:9/{}", timeout=FETCH_TIMEOUT)
+        if got is not None:
+            failures += 1
+            print(f"fetching from a closed port gave {got}, expected None", file=sys.stderr)
+        got = await arrivals.fetch_stops(["490007732E", "MISSING"], url=url, timeout=FETCH_TIMEOUT)
+        if got != []:
+            failures += 1
+            print(f"fetching a stop with no buses due gave {got}, expected []", file=sys.stderr)
+    return failures
+
+
+def main():
+    emulator.install()
+    failures = check_fixtures()
+    print()
+    check_memory()
+    print()
+    failures += asyncio.run(check_fetch())
+    if failures:
+        print(f"{failures} mismatches", file=sys.stderr)
+        sys.exit(1)
+    print("All fixtures match")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# check_colour.py - check colour.py against the old float from_hsv() and time it
+#
+# Converts a grid of hue/saturation/value with the float from_hsv() the
+# scripts used to carry their own copies of, and with colour.py's integer
+# versions, and fails if any channel differs by more than --tolerance. Then
+# times each way of getting a colour on this machine:
+#
+#   python3 host/check_colour.py
+#   python3 host/check_colour.py --calls 200000
+
+import math
+import sys
+import time
+
+import emulator
+
+
+def float_from_hsv(h, s, v):
+    # the float from_hsv() previously copied into rainbow.py, clock.py and clock_mod.py
+    i = math.floor(h * 6.0)
+    f = h * 6.0 - i
+    v *= 255.0
+    p = v * (1.0 - s)
+    q = v * (1.0 - f * s)
+    t = v * (1.0 - (1.0 - f) * s)
+
+    i = int(i) % 6
+    if i == 0:
+        return int(v), int(t), int(p)
+    if i == 1:
+        return int(q), int(v), int(p)
+    if i == 2:
+        return int(p), int(v), int(t)
+    if i == 3:
+        return int(p), int(q), int(v)
+    if i == 4:
+        return int(t), int(p), int(v)
+    if i == 5:
+        return int(v), int(p), int(q)
+
+
+def check(tolerance):
+    """Largest channel difference from the float version over a grid, for each function."""
+    import colour
+
+    worst = {"from_hsv": 0, "hsv_to_rgb": 0, "hsv_row": 0}
+    row = bytearray(3 * 2)
+    for hi in range(0, colour.HUE_STEPS, 3):
+        h = hi / colour.HUE_STEPS
+        for si in range(0, 256, 15):
+            for vi in range(0, 256, 15):
+                expected = float_from_hsv(h, si / 255, vi / 255)
+                colour.hsv_row(row, 0, hi, hi + 1, si, vi, 2)
+                for name, got in (("from_hsv", colour.from_hsv(h, si / 255, vi / 255)),
+                                  ("hsv_to_rgb", colour.hsv_to_rgb(hi, si, vi)),
+                                  ("hsv_row", tuple(row[:3]))):
+                    diff = max(abs(a - b) for a, b in zip(got, expected))
+                    worst[name] = max(worst[name], diff)
+    return worst
+
+
+def per_call_ns(function, calls):
+    start = time.perf_counter()
+    function(calls)
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def bench(calls):
+    import colour
+
+    buffer = bytearray(3 * calls)
+    wheel = colour.hue_wheel()
+
+    def float_calls(n):
+        for i in range(n):
+            float_from_hsv(i / n, 1.0, 0.8)
+
+    def int_calls(n):
+        for i in range(n):
+            colour.hsv_to_rgb(i, 255, 204)
+
+    def row_call(n):
+        colour.hsv_row(buffer, 0, 0, n, 255, 204, n)
+
+    def wheel_lookups(n):
+        for i in range(n):
+            o = (i & 0xFF) * 3
+            wheel[o], wheel[o + 1], wheel[o + 2]
+
+    return {
+        "float from_hsv": per_call_ns(float_calls, calls),
+        "hsv_to_rgb": per_call_ns(int_calls, calls),
+        "hsv_row (per colour)": per_call_ns(row_call, calls),
+        "hue_wheel lookup": per_call_ns(wheel_lookups, calls),
+    }
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Check and time colour.py against the float from_hsv()")
+    parser.add_argument("--tolerance", type=int, default=2, help="largest allowed channel difference")
+    parser.add_argument("--calls", type=int, default=100000)
+    args = parser.parse_args()
+
+    emulator.install()
+
+    worst = check(args.tolerance)
+    for name, diff in worst.items():
+        print(f"{name:<12} max channel difference {diff}")
+
+    print()
+    for name, ns in bench(args.calls).items():
+        print(f"{name:<22}{ns:>8.0f} ns per colour")
+
+    if max(worst.values()) > args.tolerance:
+        print(f"Differences above tolerance {args.tolerance}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
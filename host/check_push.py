@@ -0,0 +1,227 @@
+# check_push.py - check main.py falls back to REST while the broker is down
+#
+# Runs main.py under the emulator against a local stand-in for its REST URL
+# and the stand-in broker from mqtt_broker.py, with main.py's sleeps and
+# timeouts sped up TIME_SCALE times. The broker starts down, comes up with a
+# retained message, goes down and comes back up again with another, and the
+# check follows main.py's log through it:
+#
+#   1. the first text arrives over REST while the broker is unreachable
+#   2. the retained message is pushed once the broker is up
+#   3. with the broker down again, new text arrives over REST
+#   4. push delivery resumes when the broker comes back
+#
+# It also fails if anything asks the WLAN to join or leave the network more
+# than main.py's own connect at start up, as REST polling needs the link the
+# whole time.
+#
+#   python3 host/check_push.py
+
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import types
+
+import emulator
+
+TIME_SCALE = 20
+STEP_TIMEOUT = 30  # real seconds to wait for each step
+
+
+class Stop(Exception):
+    pass
+
+
+class Scenario:
+    def __init__(self):
+        self.lines = []
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.rest_text = "rest 1"
+        self.broker = None
+        self.failure = None
+        self.steps = []  # the steps passed
+
+    def seen(self, text, start=0):
+        with self.lock:
+            return any(text in line for line in self.lines[start:])
+
+    def mark(self):
+        with self.lock:
+            return len(self.lines)
+
+    async def wait_for_line(self, text, start, sleep):
+        deadline = time.monotonic() + STEP_TIMEOUT
+        while not self.seen(text, start):
+            if time.monotonic() > deadline:
+                raise AssertionError(f"no log line containing {text!r}")
+            await sleep(0.05)
+
+    async def serve_rest(self):
+        async def handle(reader, writer):
+            while (await reader.readline()) not in (b"\r\n", b""):
+                pass
+            body = json.dumps({"text": self.rest_text}).encode()
+            writer.write(b"HTTP/1.0 200 OK\r\nContent-Type: application/json\r\n\r\n" + body)
+            await writer.drain()
+            writer.close()
+
+        return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+    async def start_broker(self, port, topic, text):
+        import mqtt_broker
+
+        mqtt_broker.retained[topic] = text.encode()
+        self.broker = await asyncio.start_server(mqtt_broker.handle_connection, "127.0.0.1", port)
+
+    async def stop_broker(self):
+        import mqtt_broker
+
+        self.broker.close()
+        for client in list(mqtt_broker.clients):
+            client.writer.close()
+        await self.broker.wait_closed()
+
+    async def run(self, ports, ready, sleep):
+        rest = await self.serve_rest()
+        ports["rest"] = rest.sockets[0].getsockname()[1]
+        # find a free port for the broker, which starts down
+        probe = await asyncio.start_server(lambda r, w: None, "127.0.0.1", 0)
+        ports["mqtt"] = probe.sockets[0].getsockname()[1]
+        probe.close()
+        await probe.wait_closed()
+        ready.set()
+
+        try:
+            start = 0
+            await self.wait_for_line("Got text: rest 1", start, sleep)
+            await self.wait_for_line("MQTT broker unreachable", start, sleep)
+            self.steps.append("1. text arrived over REST with the broker down")
+
+            topic = None
+            while topic is None:
+                with self.lock:
+                    topic = next((line.split("Push topic: ")[1] for line in self.lines if "Push topic: " in line), None)
+                await sleep(0.05)
+
+            start = self.mark()
+            await self.start_broker(ports["mqtt"], topic, "push 1")
+            await self.wait_for_line("Pushed text (retained): push 1", start, sleep)
+            self.steps.append("2. the retained message was pushed once the broker came up")
+
+            start = self.mark()
+            self.rest_text = "rest 2"
+            await self.stop_broker()
+            await self.wait_for_line("Push delivery down", start, sleep)
+            await self.wait_for_line("Got text: rest 2", start, sleep)
+            self.steps.append("3. with the broker down again, new text arrived over REST")
+
+            start = self.mark()
+            await self.start_broker(ports["mqtt"], topic, "push 2")
+            await self.wait_for_line("Pushed text (retained): push 2", start, sleep)
+            self.steps.append("4. push delivery resumed when the broker came back")
+            await self.stop_broker()
+        except AssertionError as e:
+            self.failure = str(e)
+        finally:
+            rest.close()
+            await sleep(0.1)  # let the servers' connection handlers finish
+            self.done.set()
+
+
+def scale_time():
+    """Speed up asyncio and time sleeps and asyncio timeouts TIME_SCALE times; returns the real asyncio.sleep."""
+    real_sleep = asyncio.sleep
+    real_wait_for = asyncio.wait_for
+    real_time_sleep = time.sleep
+
+    asyncio.sleep = lambda seconds, *args: real_sleep(seconds / TIME_SCALE, *args)
+    asyncio.wait_for = lambda aw, timeout: real_wait_for(aw, None if timeout is None else timeout / TIME_SCALE)
+    time.sleep = lambda seconds: real_time_sleep(seconds / TIME_SCALE)
+    return real_sleep
+
+
+def main():
+    emulator.install()
+    real_sleep = scale_time()
+
+    import galactic
+    import log
+    import network
+
+    scenario = Scenario()
+
+    # follow main.py's log
+    real_log = log.log
+
+    def follow(message_level, message, args, every=0):
+        with scenario.lock:
+            scenario.lines.append(message % args if args else message)
+        real_log(message_level, message, args, every)
+
+    log.log = follow
+
+    # count anything joining or leaving the network
+    wlan_calls = {"connect": 0, "disconnect": 0}
+    network.WLAN.connect = lambda self, *_: wlan_calls.__setitem__("connect", wlan_calls["connect"] + 1)
+    network.WLAN.disconnect = lambda self: wlan_calls.__setitem__("disconnect", wlan_calls["disconnect"] + 1)
+
+    # the servers run in their own thread, main.py in this one until the scenario is done
+    class StopWhenDone:
+        def record(self, graphics, brightness):
+            if scenario.done.is_set():
+                raise Stop()
+
+    galactic.recorder = StopWhenDone()
+
+    ports = {}
+    ready = threading.Event()
+    servers = threading.Thread(target=lambda: asyncio.new_event_loop().run_until_complete(
+        scenario.run(ports, ready, real_sleep)), daemon=True)
+    servers.start()
+    ready.wait()
+
+    sys.modules["local_secrets"] = types.SimpleNamespace(
+        WIFI_SSID="ssid", WIFI_PASSWORD="password", BEARER_TOKEN="token",
+        URL="http://127.0.0.1:%d/text.json" % ports["rest"],
+        MQTT_SERVER="127.0.0.1", MQTT_PORT=ports["mqtt"], MQTT_USER="", MQTT_PASSWORD="", MQTT_SSL=False)
+
+    output = io.StringIO()
+    start = time.monotonic()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)  # main.py's text cache goes here
+        with contextlib.redirect_stdout(output):
+            try:
+                import runpy
+                runpy.run_path(os.path.join(emulator.REPO_DIR, "main.py"), run_name="__main__")
+            except Stop:
+                pass
+        os.chdir(emulator.REPO_DIR)
+
+    for step in scenario.steps:
+        print(step)
+
+    failures = []
+    if scenario.failure:
+        failures.append(scenario.failure)
+    if wlan_calls != {"connect": 1, "disconnect": 0}:
+        failures.append(f"WLAN joined {wlan_calls['connect']} times and left {wlan_calls['disconnect']} times, "
+                        f"expected to join once at start up")
+    print(f"Took {time.monotonic() - start:.1f}s, WLAN connect() calls: {wlan_calls['connect']}, "
+          f"disconnect() calls: {wlan_calls['disconnect']}")
+    if failures:
+        print(output.getvalue(), file=sys.stderr)
+        for failure in failures:
+            print("FAIL:", failure, file=sys.stderr)
+        sys.exit(1)
+    print("Push and REST fallback behave")
+
+
+if __name__ == "__main__":
+    main()
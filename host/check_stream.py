@@ -0,0 +1,138 @@
+# check_stream.py - check PixelStream draws exactly what per-pixel calls would
+#
+# Each test frame (RGB bytes) is drawn four ways on separate emulated displays:
+#   - per pixel: set_pen(create_pen(r, g, b)) + pixel(x, y) for every pixel,
+#     the way effects used to draw
+#   - PixelStream.present() with the bulk framebuffer copy
+#   - PixelStream.present(start, end) over a few dirty spans, which must
+#     cover the frame between them
+#   - PixelStream.present() forced onto the drawing-call fallback
+# and the framebuffers must match byte for byte. Test frames are random noise,
+# a few flat colours in blocks (the fallback's best case) and frames taken
+# from effects that draw through a PixelStream.
+#
+#   python3 host/check_stream.py
+#   python3 host/check_stream.py --frames 200 --effects rainbow
+
+import random
+import sys
+
+import emulator
+
+
+def draw_per_pixel(graphics, frame, width, height):
+    o = 0
+    for y in range(height):
+        for x in range(width):
+            graphics.set_pen(graphics.create_pen(frame[o], frame[o + 1], frame[o + 2]))
+            graphics.pixel(x, y)
+            o += 3
+
+
+def to_stream(frame):
+    """RGB bytes in the PixelStream frame's B, G, R, 0 order."""
+    out = bytearray(len(frame) // 3 * 4)
+    out[0::4] = frame[2::3]
+    out[1::4] = frame[1::3]
+    out[2::4] = frame[0::3]
+    return out
+
+
+def from_stream(frame):
+    """A PixelStream frame as RGB bytes."""
+    out = bytearray(len(frame) // 4 * 3)
+    out[0::3] = frame[2::4]
+    out[1::3] = frame[1::4]
+    out[2::3] = frame[0::4]
+    return bytes(out)
+
+
+def noise_frame(size):
+    return bytes(random.getrandbits(8) for _ in range(size * 3))
+
+
+def block_frame(width, height):
+    colours = [bytes(random.getrandbits(8) for _ in range(3)) for _ in range(4)]
+    block = random.randint(1, 8)
+    return b"".join(colours[(x // block + y // block) % len(colours)]
+                    for y in range(height) for x in range(width))
+
+
+def check(frames):
+    """Compare the four paths for each frame; returns (failures, call counts per path)."""
+    from picographics import PicoGraphics, DISPLAY_GALACTIC_UNICORN, WIDTH, HEIGHT
+    from pixelstream import PixelStream
+
+    surfaces = {name: PicoGraphics(DISPLAY_GALACTIC_UNICORN) for name in ("pixel", "bulk", "spans", "fallback")}
+    streams = {
+        "bulk": PixelStream(surfaces["bulk"], WIDTH, HEIGHT),
+        "spans": PixelStream(surfaces["spans"], WIDTH, HEIGHT),
+        "fallback": PixelStream(surfaces["fallback"], WIDTH, HEIGHT, bulk=False),
+    }
+    assert streams["bulk"].fb is not None and streams["fallback"].fb is None
+
+    size = WIDTH * HEIGHT
+    failures = []
+    for label, frame in frames:
+        draw_per_pixel(surfaces["pixel"], frame, WIDTH, HEIGHT)
+        for name, stream in streams.items():
+            stream.frame[:] = to_stream(frame)
+            if name == "spans":
+                cuts = [0] + sorted(random.randrange(size + 1) for _ in range(3)) + [size]
+                for start, end in zip(cuts, cuts[1:]):
+                    stream.present(start, end)
+            else:
+                stream.present()
+            if bytes(surfaces[name]) != bytes(surfaces["pixel"]):
+                failures.append((label, name))
+
+    calls = {name: {key: value / len(frames) for key, value in surface.counts.items()}
+             for name, surface in surfaces.items()}
+    return failures, calls
+
+
+def effect_frames(name, count):
+    """Frames an effect drew into its PixelStream."""
+    from picographics import PicoGraphics, DISPLAY_GALACTIC_UNICORN
+
+    effect = emulator.load_effect(name, PicoGraphics(DISPLAY_GALACTIC_UNICORN))
+    frames = []
+    for i in range(count):
+        effect.draw()
+        frames.append((f"{name} {i}", from_stream(effect.stream.frame)))
+    return frames
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Check PixelStream against per-pixel drawing")
+    parser.add_argument("--frames", type=int, default=50, help="frames of each kind")
+    parser.add_argument("--effects", nargs="*", default=["rainbow"], help="effects that draw through a PixelStream")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    emulator.install(fast=True)
+    from picographics import WIDTH, HEIGHT
+
+    random.seed(args.seed)
+    frames = [(f"noise {i}", noise_frame(WIDTH * HEIGHT)) for i in range(args.frames)]
+    frames += [(f"blocks {i}", block_frame(WIDTH, HEIGHT)) for i in range(args.frames)]
+    for name in args.effects:
+        frames += effect_frames(name, args.frames)
+
+    failures, calls = check(frames)
+
+    print(f"{'path':<10}{'set_pen':>9}{'pixel':>8}{'span':>7}{'clear':>7}   (calls per frame, {len(frames)} frames)")
+    for name, c in calls.items():
+        print(f"{name:<10}{c['set_pen']:>9.1f}{c['pixel']:>8.1f}{c['pixel_span']:>7.1f}{c['clear']:>7.1f}")
+    for label, name in failures[:10]:
+        print(f"MISMATCH {name} path on frame {label}", file=sys.stderr)
+    if failures:
+        print(f"{len(failures)} mismatches", file=sys.stderr)
+        sys.exit(1)
+    print("All paths match")
+
+
+if __name__ == "__main__":
+    main()
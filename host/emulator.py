@@ -0,0 +1,246 @@
+# emulator.py - run the Galactic Unicorn effects on a desktop
+#
+# Puts the CPython stand-ins in this directory (galactic, picographics,
+# machine, network, ...) in front of the real modules, captures every
+# gu.update() as a frame, and reports how fast an effect draws. Frames can be
+# saved and later compared against these "golden" frames to check that an
+# optimisation didn't change what is drawn.
+#
+# Effects that follow main_choose.py's contract (graphics, init(), draw()):
+#   python3 host/emulator.py fire --frames 200
+#   python3 host/emulator.py fire --frames 50 --seed 1 --save fire.frames
+#   python3 host/emulator.py fire --frames 50 --seed 1 --golden fire.frames
+#
+# Stand-alone scripts with their own loop, stopped after --frames updates:
+#   python3 host/emulator.py --script clock.py --frames 20 --fast
+
+import builtins
+import os
+import random
+import sys
+import time
+
+HOST_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(HOST_DIR)
+
+FRAMES_MAGIC = b"UFRM"
+HEAP_SIZE = 192 * 1024  # roughly what a Pico W has free for MicroPython
+
+
+class FrameLimitReached(Exception):
+    pass
+
+
+class FrameRecorder:
+    """Collects frames as packed RGB bytes, optionally stopping after limit frames."""
+
+    def __init__(self, limit=None, keep=True):
+        self.limit = limit
+        self.keep = keep
+        self.count = 0
+        self.frames = []
+        self.brightness = []
+
+    def record(self, graphics, brightness):
+        if self.keep:
+            self.frames.append(frame_from_graphics(graphics))
+            self.brightness.append(brightness)
+        self.count += 1
+        if self.limit is not None and self.count >= self.limit:
+            raise FrameLimitReached()
+
+    def save(self, path):
+        save_frames(path, self.frames)
+
+
+def frame_from_graphics(graphics):
+    """Convert the emulated RGB888 framebuffer (B, G, R, 0 per pixel) to RGB bytes."""
+    from picographics import WIDTH, HEIGHT
+    fb = bytes(graphics)
+    rgb = bytearray(WIDTH * HEIGHT * 3)
+    rgb[0::3] = fb[2::4]
+    rgb[1::3] = fb[1::4]
+    rgb[2::3] = fb[0::4]
+    return bytes(rgb)
+
+
+def save_frames(path, frames):
+    from picographics import WIDTH, HEIGHT
+    with open(path, "wb") as f:
+        f.write(FRAMES_MAGIC + bytes([WIDTH, HEIGHT]))
+        for frame in frames:
+            f.write(frame)
+
+
+def load_frames(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:4] != FRAMES_MAGIC:
+        raise ValueError(path + " is not a frames file")
+    size = data[4] * data[5] * 3
+    return [data[i:i + size] for i in range(6, len(data), size)]
+
+
+def diff_frames(a, b):
+    """Number of pixels that differ between two RGB frames."""
+    return sum(1 for i in range(0, len(a), 3) if a[i:i + 3] != b[i:i + 3])
+
+
+def compare_frames(frames, golden):
+    """Return a list of (frame index, differing pixels) for every frame that doesn't match."""
+    mismatches = [(i, diff_frames(a, b)) for i, (a, b) in enumerate(zip(frames, golden))]
+    mismatches = [(i, n) for i, n in mismatches if n]
+    if len(frames) != len(golden):
+        mismatches.append((min(len(frames), len(golden)), -1))
+    return mismatches
+
+
+def save_ppm(path, frame, scale=8):
+    """Write one frame as a scaled-up PPM image for eyeballing."""
+    from picographics import WIDTH, HEIGHT
+    with open(path, "wb") as f:
+        f.write(b"P6 %d %d 255\n" % (WIDTH * scale, HEIGHT * scale))
+        for y in range(HEIGHT):
+            row = b"".join(frame[(y * WIDTH + x) * 3:(y * WIDTH + x) * 3 + 3] * scale for x in range(WIDTH))
+            f.write(row * scale)
+
+
+def install(fast=False):
+    """Make the stand-in modules importable and add the MicroPython-only names.
+
+    If fast, sleeps return immediately so scripts run flat out.
+    """
+    import asyncio
+    import binascii
+    import errno
+    import gc
+    import struct
+    import tracemalloc
+
+    for path in (REPO_DIR, HOST_DIR):
+        if path in sys.path:
+            sys.path.remove(path)
+        sys.path.insert(0, path)
+
+    import micropython
+    builtins.micropython = micropython
+
+    # MicroPython's extra time functions
+    time.ticks_ms = lambda: int(time.monotonic() * 1000)
+    time.ticks_us = lambda: int(time.monotonic() * 1000000)
+    time.ticks_diff = lambda a, b: a - b
+    time.ticks_add = lambda a, b: a + b
+    time.sleep_ms = lambda ms: time.sleep(ms / 1000)
+    time.sleep_us = lambda us: time.sleep(us / 1000000)
+    if fast:
+        time.sleep = lambda _: None
+    asyncio.sleep_ms = lambda ms: asyncio.sleep(0 if fast else ms / 1000)
+
+    # MicroPython's heap figures. CPython has no fixed heap, so these count
+    # what tracemalloc sees, which is nothing unless it has been started
+    gc.mem_alloc = lambda: tracemalloc.get_traced_memory()[0]
+    gc.mem_free = lambda: HEAP_SIZE - gc.mem_alloc()
+
+    # u-prefixed module names (usocket has its own stand-in in host/)
+    for name, module in (("utime", time), ("uasyncio", asyncio), ("ubinascii", binascii),
+                         ("uerrno", errno), ("ustruct", struct)):
+        sys.modules.setdefault(name, module)
+
+
+def load_effect(name, graphics):
+    """Import an effect module and set it up the way main_choose.py does."""
+    import importlib
+    effect = importlib.import_module(name)
+    effect.graphics = graphics
+    effect.init()
+    return effect
+
+
+def run_effect(name, frames, seed=None, keep=True):
+    """Draw frames frames of an effect; returns (recorder, list of draw() times in seconds)."""
+    import galactic
+    from galactic import GalacticUnicorn
+    from picographics import PicoGraphics, DISPLAY_GALACTIC_UNICORN
+
+    if seed is not None:
+        random.seed(seed)
+
+    gu = GalacticUnicorn()
+    graphics = PicoGraphics(DISPLAY_GALACTIC_UNICORN)
+    recorder = FrameRecorder(keep=keep)
+    galactic.recorder = recorder
+
+    effect = load_effect(name, graphics)
+    times = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        effect.draw()
+        times.append(time.perf_counter() - start)
+        gu.update(graphics)
+    return recorder, times
+
+
+def run_script(path, frames, seed=None):
+    """Run a stand-alone script until it has called update() frames times."""
+    import runpy
+    import galactic
+
+    if seed is not None:
+        random.seed(seed)
+
+    recorder = FrameRecorder(limit=frames)
+    galactic.recorder = recorder
+    start = time.perf_counter()
+    try:
+        runpy.run_path(path, run_name="__main__")
+    except FrameLimitReached:
+        pass
+    return recorder, time.perf_counter() - start
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run Galactic Unicorn effects on the desktop")
+    parser.add_argument("effect", nargs="?", help="effect module honouring init()/draw(), e.g. fire")
+    parser.add_argument("--script", help="stand-alone script to run instead, e.g. clock.py")
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--seed", type=int, help="seed random for repeatable frames")
+    parser.add_argument("--fast", action="store_true", help="make sleeps return immediately")
+    parser.add_argument("--save", metavar="FILE", help="save the frames, e.g. as golden frames")
+    parser.add_argument("--golden", metavar="FILE", help="compare the frames with saved golden frames")
+    parser.add_argument("--ppm", metavar="FILE", help="write the last frame as a PPM image")
+    args = parser.parse_args()
+
+    if not args.effect and not args.script:
+        parser.error("give an effect name or --script")
+
+    install(fast=args.fast)
+
+    if args.script:
+        recorder, elapsed = run_script(args.script, args.frames, args.seed)
+        print(f"{args.script}: {recorder.count} frames in {elapsed:.3f}s ({recorder.count / elapsed:.1f} fps)")
+    else:
+        recorder, times = run_effect(args.effect, args.frames, args.seed)
+        total = sum(times)
+        print(f"{args.effect}: {len(times)} frames, mean draw {total / len(times) * 1000:.3f}ms "
+              f"({len(times) / total:.1f} fps)")
+
+    if args.save:
+        recorder.save(args.save)
+        print(f"Saved {len(recorder.frames)} frames to {args.save}")
+
+    if args.ppm and recorder.frames:
+        save_ppm(args.ppm, recorder.frames[-1])
+
+    if args.golden:
+        mismatches = compare_frames(recorder.frames, load_frames(args.golden))
+        if mismatches:
+            for i, n in mismatches[:10]:
+                print(f"  frame {i}: " + ("frame count differs" if n < 0 else f"{n} pixels differ"))
+            sys.exit(f"{len(mismatches)} frames differ from {args.golden}")
+        print(f"All frames match {args.golden}")
+
+
+if __name__ == "__main__":
+    main()
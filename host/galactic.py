@@ -0,0 +1,94 @@
+# galactic.py - CPython stand-in for Pimoroni's galactic module
+#
+# update() hands each frame to the current recorder (see emulator.py) instead
+# of driving LEDs, and buttons are "pressed" by adding them to the pressed set,
+# e.g. galactic.pressed.add(GalacticUnicorn.SWITCH_A).
+
+pressed = set()
+recorder = None  # set by emulator.py; anything with a record(graphics, brightness) method
+
+
+class Channel:
+    NOISE = 128
+    SQUARE = 64
+    SAW = 32
+    TRIANGLE = 16
+    SINE = 8
+    WAVE = 1
+
+    def __init__(self, *_, **__):
+        pass
+
+    def configure(self, *_, **__):
+        pass
+
+    def frequency(self, *_):
+        pass
+
+    def trigger_attack(self):
+        pass
+
+    def trigger_release(self):
+        pass
+
+    def play_tone(self, *_, **__):
+        pass
+
+
+class GalacticUnicorn:
+    WIDTH = 53
+    HEIGHT = 11
+
+    SWITCH_A = 0
+    SWITCH_B = 1
+    SWITCH_C = 3
+    SWITCH_D = 6
+    SWITCH_SLEEP = 27
+    SWITCH_VOLUME_UP = 7
+    SWITCH_VOLUME_DOWN = 8
+    SWITCH_BRIGHTNESS_UP = 21
+    SWITCH_BRIGHTNESS_DOWN = 26
+
+    def __init__(self):
+        self._brightness = 0.5
+        self._volume = 0.5
+
+    def update(self, graphics):
+        if recorder is not None:
+            recorder.record(graphics, self._brightness)
+
+    def clear(self):
+        pass
+
+    def is_pressed(self, switch):
+        return switch in pressed
+
+    def set_brightness(self, value):
+        self._brightness = max(0.0, min(1.0, value))
+
+    def get_brightness(self):
+        return self._brightness
+
+    def adjust_brightness(self, delta):
+        self.set_brightness(self._brightness + delta)
+
+    def set_volume(self, value):
+        self._volume = max(0.0, min(1.0, value))
+
+    def get_volume(self):
+        return self._volume
+
+    def adjust_volume(self, delta):
+        self.set_volume(self._volume + delta)
+
+    def light(self):
+        return 0
+
+    def synth_channel(self, channel):
+        return Channel()
+
+    def play_synth(self):
+        pass
+
+    def stop_playing(self):
+        pass
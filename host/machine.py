@@ -0,0 +1,76 @@
+# machine.py - CPython stand-in for the parts of the MicroPython machine
+# module used by the scripts in this repo.
+
+import time
+
+_freq = 125000000
+
+
+def freq(hz=None):
+    global _freq
+    if hz is None:
+        return _freq
+    _freq = hz
+
+
+def unique_id():
+    return b"\xe6\x61\x41\x04\x03\x2b\x2a\x21"
+
+
+def reset():
+    raise SystemExit("machine.reset()")
+
+
+def idle():
+    pass
+
+
+def lightsleep(ms=None):
+    if ms:
+        time.sleep(ms / 1000)
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+
+    def __init__(self, id, mode=-1, pull=-1, value=None):
+        self.id = id
+        self._value = value or 0
+
+    def __call__(self, value=None):
+        return self.value(value)
+
+    def value(self, value=None):
+        if value is None:
+            return self._value
+        self._value = value
+
+    def irq(self, trigger=None, handler=None):
+        pass
+
+
+class RTC:
+    def datetime(self, datetimetuple=None):
+        if datetimetuple is not None:
+            return
+        t = time.localtime()
+        return (t.tm_year, t.tm_mon, t.tm_mday, t.tm_wday, t.tm_hour, t.tm_min, t.tm_sec, 0)
+
+
+class Timer:
+    PERIODIC = 1
+    ONE_SHOT = 0
+
+    def __init__(self, id=-1):
+        pass
+
+    def init(self, *_, **__):
+        pass
+
+    def deinit(self):
+        pass
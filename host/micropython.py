@@ -0,0 +1,21 @@
+# micropython.py - CPython stand-in for the micropython module
+#
+# The code emitters are no-ops on the desktop, so decorated functions just
+# run as ordinary Python. emulator.install() also makes this module available
+# as the builtin name micropython, as it is on the board.
+
+
+def native(f):
+    return f
+
+
+def viper(f):
+    return f
+
+
+def const(x):
+    return x
+
+
+def mem_info(*_):
+    pass
@@ -0,0 +1,201 @@
+# mqtt_broker.py - a tiny mosquitto-style MQTT 3.1.1 broker for the desktop
+#
+# Runs under CPython (not on the board) so main.py's push mode can be tried
+# against a broker on the local network without a cloud account. It supports
+# just enough for mqtt_as.py and mosquitto_pub/mosquitto_sub: CONNECT,
+# SUBSCRIBE/UNSUBSCRIBE with + and # wildcards, PUBLISH at QoS 0/1, retained
+# messages, PINGREQ and DISCONNECT. There is no authentication or persistence.
+#
+# Usage:
+#   python3 host/mqtt_broker.py [--port 1883] [--retain TOPIC=TEXT ...]
+#
+# then point MQTT_SERVER in local_secrets.py at this machine, and change the
+# message with e.g.
+#   mosquitto_pub -h <this machine> -t unicorn/text/<device id> -r -m "Hello"
+
+import argparse
+import asyncio
+
+CONNECT, CONNACK, PUBLISH, PUBACK = 1, 2, 3, 4
+SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK = 8, 9, 10, 11
+PINGREQ, PINGRESP, DISCONNECT = 12, 13, 14
+
+retained = {}     # topic -> payload
+clients = set()   # connected Client objects
+
+
+def topic_matches(topic_filter, topic):
+    """True if topic matches an MQTT subscription filter with + and # wildcards."""
+    filter_parts = topic_filter.split("/")
+    topic_parts = topic.split("/")
+    for i, part in enumerate(filter_parts):
+        if part == "#":
+            return True
+        if i >= len(topic_parts):
+            return False
+        if part != "+" and part != topic_parts[i]:
+            return False
+    return len(filter_parts) == len(topic_parts)
+
+
+def encode_length(n):
+    out = bytearray()
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        out.append(byte | 0x80 if n else byte)
+        if not n:
+            return bytes(out)
+
+
+def encode_str(s):
+    return len(s).to_bytes(2, "big") + s
+
+
+def publish_packet(topic, payload, retain):
+    body = encode_str(topic.encode()) + payload
+    return bytes([PUBLISH << 4 | (1 if retain else 0)]) + encode_length(len(body)) + body
+
+
+class Client:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.filters = set()
+        self.name = "?"
+
+    async def read_packet(self):
+        header = await self.reader.readexactly(1)
+        length, shift = 0, 0
+        while True:
+            byte = (await self.reader.readexactly(1))[0]
+            length |= (byte & 0x7F) << shift
+            shift += 7
+            if not byte & 0x80:
+                break
+        body = await self.reader.readexactly(length) if length else b""
+        return header[0], body
+
+    def send(self, packet):
+        self.writer.write(packet)
+
+    def deliver(self, topic, payload, retain=False):
+        if any(topic_matches(f, topic) for f in self.filters):
+            self.send(publish_packet(topic, payload, retain))
+
+    def handle_publish(self, flags, body):
+        qos = (flags >> 1) & 3
+        topic_len = int.from_bytes(body[0:2], "big")
+        topic = body[2:2 + topic_len].decode()
+        pos = 2 + topic_len
+        if qos:
+            pid = body[pos:pos + 2]
+            pos += 2
+            self.send(bytes([PUBACK << 4, 2]) + pid)
+        payload = body[pos:]
+
+        if flags & 1:
+            if payload:
+                retained[topic] = payload
+            else:
+                retained.pop(topic, None)
+        print(f"[{self.name}] PUBLISH {topic} = {payload!r}{' (retained)' if flags & 1 else ''}")
+
+        for client in list(clients):
+            client.deliver(topic, payload)
+
+    def handle_subscribe(self, body):
+        pid = body[0:2]
+        pos = 2
+        granted = bytearray()
+        new_filters = []
+        while pos < len(body):
+            topic_len = int.from_bytes(body[pos:pos + 2], "big")
+            topic_filter = body[pos + 2:pos + 2 + topic_len].decode()
+            qos = body[pos + 2 + topic_len]
+            pos += 3 + topic_len
+            self.filters.add(topic_filter)
+            new_filters.append(topic_filter)
+            granted.append(min(qos, 1))
+            print(f"[{self.name}] SUBSCRIBE {topic_filter}")
+
+        self.send(bytes([SUBACK << 4]) + encode_length(2 + len(granted)) + pid + granted)
+
+        # Retained messages go out straight after the SUBACK
+        for topic, payload in retained.items():
+            if any(topic_matches(f, topic) for f in new_filters):
+                self.send(publish_packet(topic, payload, True))
+
+    def handle_unsubscribe(self, body):
+        pid = body[0:2]
+        pos = 2
+        while pos < len(body):
+            topic_len = int.from_bytes(body[pos:pos + 2], "big")
+            self.filters.discard(body[pos + 2:pos + 2 + topic_len].decode())
+            pos += 2 + topic_len
+        self.send(bytes([UNSUBACK << 4, 2]) + pid)
+
+    async def run(self):
+        try:
+            while True:
+                header, body = await self.read_packet()
+                packet_type, flags = header >> 4, header & 0x0F
+
+                if packet_type == CONNECT:
+                    # Skip the protocol name, level, flags and keepalive to get the client id
+                    name_len = int.from_bytes(body[0:2], "big")
+                    pos = 2 + name_len + 4
+                    id_len = int.from_bytes(body[pos:pos + 2], "big")
+                    self.name = body[pos + 2:pos + 2 + id_len].decode(errors="replace")
+                    print(f"[{self.name}] CONNECT")
+                    self.send(bytes([CONNACK << 4, 2, 0, 0]))
+                elif packet_type == PUBLISH:
+                    self.handle_publish(flags, body)
+                elif packet_type == SUBSCRIBE:
+                    self.handle_subscribe(body)
+                elif packet_type == UNSUBSCRIBE:
+                    self.handle_unsubscribe(body)
+                elif packet_type == PINGREQ:
+                    self.send(bytes([PINGRESP << 4, 0]))
+                elif packet_type == DISCONNECT:
+                    break
+                # PUBACKs for what we send at QoS 0 never arrive, anything else is ignored
+
+                await self.writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            print(f"[{self.name}] disconnected")
+            clients.discard(self)
+            self.writer.close()
+
+
+async def handle_connection(reader, writer):
+    client = Client(reader, writer)
+    clients.add(client)
+    await client.run()
+
+
+async def serve(host, port):
+    server = await asyncio.start_server(handle_connection, host, port)
+    print(f"MQTT stand-in broker listening on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Minimal MQTT 3.1.1 broker for testing main.py push mode")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--retain", action="append", default=[], metavar="TOPIC=TEXT",
+                        help="preload a retained message (can be repeated)")
+    args = parser.parse_args()
+
+    for item in args.retain:
+        topic, _, text = item.partition("=")
+        retained[topic] = text.encode()
+
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,32 @@
+# network.py - CPython stand-in for the MicroPython network module
+#
+# The desktop already has a network connection, so the WLAN interface just
+# reports itself as connected.
+
+STA_IF = 0
+AP_IF = 1
+
+
+class WLAN:
+    def __init__(self, interface=STA_IF):
+        self._active = False
+
+    def active(self, state=None):
+        if state is not None:
+            self._active = state
+        return self._active
+
+    def connect(self, *_):
+        pass
+
+    def disconnect(self):
+        pass
+
+    def isconnected(self):
+        return True
+
+    def status(self):
+        return 3  # STAT_GOT_IP
+
+    def config(self, *_, **__):
+        pass
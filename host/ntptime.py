@@ -0,0 +1,9 @@
+# ntptime.py - CPython stand-in for the MicroPython ntptime module
+#
+# The emulated RTC follows the desktop clock, so there is nothing to set.
+
+host = "pool.ntp.org"
+
+
+def settime():
+    pass
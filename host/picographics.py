@@ -0,0 +1,161 @@
+# picographics.py - CPython stand-in for Pimoroni's picographics module
+#
+# Emulates the Galactic Unicorn's 53x11 RGB888 framebuffer closely enough to
+# run and time the effects on a desktop. Like the real module, the PicoGraphics
+# object exposes its framebuffer through the buffer protocol (memoryview), one
+# little-endian 0x00RRGGBB word per pixel, so code that copies rows in and out
+# of it behaves the same here.
+#
+# Text is drawn with placeholder glyphs: character widths are close to the
+# real bitmap fonts (so measuring and scrolling behave sensibly) but the
+# shapes are not the Pimoroni fonts.
+
+DISPLAY_GALACTIC_UNICORN = 13
+PEN_RGB888 = 7
+
+WIDTH = 53
+HEIGHT = 11
+BYTES_PER_PIXEL = 4
+
+# font name -> (glyph width, glyph height); the space is narrower
+FONTS = {
+    "bitmap6": (4, 6),
+    "bitmap8": (5, 8),
+    "bitmap14_outline": (8, 14),
+}
+SPACE_WIDTH = 3
+
+
+def get_required_buffer_size(display, pen_type=PEN_RGB888):
+    return WIDTH * HEIGHT * BYTES_PER_PIXEL
+
+
+class PicoGraphics(bytearray):
+    def __init__(self, display=DISPLAY_GALACTIC_UNICORN, pen_type=PEN_RGB888, **_):
+        super().__init__(WIDTH * HEIGHT * BYTES_PER_PIXEL)
+        self._pen = b"\0\0\0\0"
+        self._font = FONTS["bitmap8"]
+        self._clip = (0, 0, WIDTH, HEIGHT)
+        # call counts, for benchmarks to report how hard an effect drives the API
+        self.counts = {"create_pen": 0, "set_pen": 0, "pixel": 0, "pixel_span": 0, "clear": 0,
+                       "rectangle": 0, "circle": 0, "line": 0, "text": 0}
+
+    # --- pens ---
+
+    def create_pen(self, r, g, b):
+        self.counts["create_pen"] += 1
+        return (int(r) & 0xFF) << 16 | (int(g) & 0xFF) << 8 | (int(b) & 0xFF)
+
+    def create_pen_hsv(self, h, s, v):
+        i = int(h * 6.0)
+        f = h * 6.0 - i
+        v *= 255.0
+        p = v * (1.0 - s)
+        q = v * (1.0 - f * s)
+        t = v * (1.0 - (1.0 - f) * s)
+        r, g, b = ((v, t, p), (q, v, p), (p, v, t), (p, q, v), (t, p, v), (v, p, q))[i % 6]
+        return self.create_pen(r, g, b)
+
+    def set_pen(self, pen):
+        self.counts["set_pen"] += 1
+        self._pen = (pen & 0xFFFFFF).to_bytes(4, "little")
+
+    # --- state ---
+
+    def set_font(self, font):
+        self._font = FONTS.get(font, FONTS["bitmap8"])
+
+    def get_bounds(self):
+        return WIDTH, HEIGHT
+
+    def set_clip(self, x, y, w, h):
+        self._clip = (max(0, x), max(0, y), min(WIDTH, x + w), min(HEIGHT, y + h))
+
+    def remove_clip(self):
+        self._clip = (0, 0, WIDTH, HEIGHT)
+
+    # --- drawing ---
+
+    def _put(self, x, y):
+        x0, y0, x1, y1 = self._clip
+        if x0 <= x < x1 and y0 <= y < y1:
+            o = (y * WIDTH + x) * BYTES_PER_PIXEL
+            self[o:o + BYTES_PER_PIXEL] = self._pen
+
+    def pixel(self, x, y):
+        self.counts["pixel"] += 1
+        self._put(int(x), int(y))
+
+    def _span(self, x, y, length):
+        for i in range(int(length)):
+            self._put(int(x) + i, int(y))
+
+    def pixel_span(self, x, y, length):
+        self.counts["pixel_span"] += 1
+        self._span(x, y, length)
+
+    def clear(self):
+        self.counts["clear"] += 1
+        x0, y0, x1, y1 = self._clip
+        row = self._pen * (x1 - x0)
+        for y in range(y0, y1):
+            o = (y * WIDTH + x0) * BYTES_PER_PIXEL
+            self[o:o + len(row)] = row
+
+    def rectangle(self, x, y, w, h):
+        self.counts["rectangle"] += 1
+        for yy in range(int(y), int(y + h)):
+            self._span(x, yy, w)
+
+    def circle(self, x, y, r):
+        # filled, like PicoGraphics
+        self.counts["circle"] += 1
+        r = int(r)
+        for dy in range(-r, r + 1):
+            for dx in range(-r, r + 1):
+                if dx * dx + dy * dy <= r * r:
+                    self._put(int(x) + dx, int(y) + dy)
+
+    def line(self, x1, y1, x2, y2, thickness=1):
+        self.counts["line"] += 1
+        x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
+        dx, dy = abs(x2 - x1), -abs(y2 - y1)
+        sx, sy = (1 if x1 < x2 else -1), (1 if y1 < y2 else -1)
+        err = dx + dy
+        while True:
+            self._put(x1, y1)
+            if x1 == x2 and y1 == y2:
+                return
+            e2 = 2 * err
+            if e2 >= dy:
+                err += dy
+                x1 += sx
+            if e2 <= dx:
+                err += dx
+                y1 += sy
+
+    # --- text ---
+
+    def _char_width(self, c):
+        return SPACE_WIDTH if c == " " else self._font[0]
+
+    def measure_text(self, text, scale=1, spacing=1, fixed_width=False):
+        return sum((self._char_width(c) + spacing) * scale for c in text)
+
+    def text(self, text, x, y, wordwrap=-1, scale=1, angle=0, spacing=1, fixed_width=False):
+        self.counts["text"] += 1
+        glyph_height = self._font[1]
+        x, y = int(x), int(y)
+        for c in text:
+            w = self._char_width(c)
+            if c != " " and x + w * scale > 0 and x < WIDTH:
+                # a stable pseudo-random pattern per character stands in for the glyph
+                bits = (ord(c) * 2654435761) & 0xFFFFFFFF
+                for gy in range(glyph_height):
+                    row = (bits >> (gy % 8 * 4)) | 1 << (gy % w)
+                    for gx in range(w):
+                        if row >> gx & 1:
+                            for sy in range(scale):
+                                for sx in range(scale):
+                                    self._put(x + gx * scale + sx, y + gy * scale + sy)
+            x += (w + spacing) * scale
@@ -0,0 +1,37 @@
+# usocket.py - CPython stand-in for MicroPython's usocket module
+#
+# MicroPython sockets have read() and write(), which on a non-blocking socket
+# return None when there is nothing to read or no room to write instead of
+# raising. mqtt_as.py polls its broker connection that way, so this wraps a
+# CPython socket to behave the same.
+
+import socket as _socket
+from socket import getaddrinfo, AF_INET, SOCK_STREAM  # noqa: F401
+
+
+class socket:
+    def __init__(self, *args):
+        self._sock = _socket.socket(*args)
+
+    def setblocking(self, flag):
+        self._sock.setblocking(flag)
+
+    def connect(self, address):
+        # a non-blocking connect raises BlockingIOError, an OSError with
+        # EINPROGRESS, as MicroPython's does
+        self._sock.connect(address)
+
+    def read(self, n=4096):
+        try:
+            return self._sock.recv(n)
+        except BlockingIOError:
+            return None
+
+    def write(self, data):
+        try:
+            return self._sock.send(data)
+        except BlockingIOError:
+            return None
+
+    def close(self):
+        self._sock.close()
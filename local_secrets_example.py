@@ -1,4 +1,17 @@
 WIFI_SSID="Your Wifi ssid here"
 WIFI_PASSWORD="Your wifi password here"
 URL="https://example.com/your_text_here.json"
-password="My password is super secure"
\ No newline at end of file
+password="My password is super secure"
+BEARER_TOKEN="Your bearer token here"
+
+# Optional: push text to main.py over MQTT instead of polling URL.
+# Leave these out to poll only. The topic is unicorn/text/<board unique id>,
+# which main.py prints at start up.
+#MQTT_SERVER="192.168.1.10"
+#MQTT_PORT=1883
+#MQTT_USER=""
+#MQTT_PASSWORD=""
+#MQTT_SSL=False
+
+# Optional: the TfL stop ids text.py shows arrivals for, merged into one board.
+#STOP_IDS=["490007732N", "490007732S"]
@@ -0,0 +1,103 @@
+# log.py - a tiny levelled logger for the scripts, rate limited and kept in a ring
+#
+# print() goes out over USB serial, which takes a good part of a frame and
+# blocks altogether when nothing on the computer is reading, so the render
+# loops mustn't print every frame. Log through here instead:
+#
+#   import log
+#   log.info("Connected to WiFi")
+#   log.warning("Unexpected HTTP status: %s", status)
+#   log.debug("frame gap %d ms", gap, every=1000)   # at most once a second
+#   log.dump()                                       # print the ring
+#
+# Messages below `level` aren't printed; set log.level = log.DEBUG to see the
+# per-frame ones, or log.OFF for silence. Messages at `ring_level` and above
+# are also kept in a ring of the last RING_SIZE, so what led up to a problem
+# can be dumped on demand (the scripts do it on the sleep button) even with
+# printing off. A message wanted by neither is dropped before its arguments
+# are formatted, so a debug call in a hot loop costs a call and a comparison;
+# guard it with `if log.enabled(log.DEBUG):` to skip even that.
+#
+# every=ms rate limits a call site, identified by its format string: calls
+# within ms of the last one logged are counted and the count is added to the
+# next message that gets through.
+
+import time
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+OFF = 100
+
+NAMES = {DEBUG: "D", INFO: "I", WARNING: "W", ERROR: "E"}
+RING_SIZE = 32
+
+level = INFO       # print messages at this level and above
+ring_level = INFO  # keep messages at this level and above in the ring
+
+_ring = [None] * RING_SIZE
+_ring_next = 0
+_limits = {}  # format string: [ticks last logged, calls dropped since]
+
+
+def enabled(message_level):
+    """Whether a message at this level would be printed or kept."""
+    return message_level >= level or message_level >= ring_level
+
+
+def log(message_level, message, args, every=0):
+    global _ring_next
+
+    if message_level < level and message_level < ring_level:
+        return
+    dropped = 0
+    if every:
+        now = time.ticks_ms()
+        limit = _limits.get(message)
+        if limit is None:
+            _limits[message] = [now, 0]
+        elif time.ticks_diff(now, limit[0]) < every:
+            limit[1] += 1
+            return
+        else:
+            dropped = limit[1]
+            limit[0] = now
+            limit[1] = 0
+
+    if args:
+        message = message % args
+    if dropped:
+        message = "{} ({} more)".format(message, dropped)
+    line = "{} {} {}".format(time.ticks_ms(), NAMES.get(message_level, "?"), message)
+    if message_level >= level:
+        print(line)
+    if message_level >= ring_level:
+        _ring[_ring_next] = line
+        _ring_next = (_ring_next + 1) % RING_SIZE
+
+
+def debug(message, *args, every=0):
+    log(DEBUG, message, args, every)
+
+
+def info(message, *args, every=0):
+    log(INFO, message, args, every)
+
+
+def warning(message, *args, every=0):
+    log(WARNING, message, args, every)
+
+
+def error(message, *args, every=0):
+    log(ERROR, message, args, every)
+
+
+def dump():
+    """Print the messages in the ring, oldest first."""
+    print("--- recent log messages ---")
+    for i in range(RING_SIZE):
+        line = _ring[(_ring_next + i) % RING_SIZE]
+        if line is not None:
+            print(line)
+    print("---")
@@ -1,6 +1,10 @@
+import gc
 import json
 import network
-import urequests
+import uasyncio as asyncio
+import ahttp
+import log
+from pens import pen_cache
 
 from galactic import GalacticUnicorn
 from picographics import PicoGraphics, DISPLAY_GALACTIC_UNICORN as DISPLAY
@@ -10,6 +14,7 @@ from local_secrets import WIFI_SSID, WIFI_PASSWORD, URL, BEARER_TOKEN
 # --- Setup display ---
 graphics = PicoGraphics(DISPLAY)
 gu = GalacticUnicorn()
+pens = pen_cache(graphics)
 
 WIDTH = GalacticUnicorn.WIDTH
 HEIGHT = GalacticUnicorn.HEIGHT
@@ -40,6 +45,48 @@ ERROR_RED_PEN = PENS[RED]
 BLACK_PEN = PENS[BLACK]
 
 DEFAULT_LOCAL_MESSAGE = "Default message"
+REFRESH_INTERVAL = 30  # seconds between background text refreshes
+
+# Set to ask the background refresh task to fetch new text straight away
+refresh_requested = asyncio.Event()
+
+# --- Response Cache ---
+# The last good text and its HTTP validators are kept in flash. The validators
+# let the server answer 304 Not Modified instead of resending the payload, and
+# the saved text lets a reboot show the last message before Wi-Fi is even up.
+CACHE_FILE = "text_cache.json"
+cached_text = None
+etag = None
+last_modified = None
+
+# --- Push Delivery (optional) ---
+# With MQTT settings in local_secrets.py the text is pushed to us: we subscribe
+# to a per-device topic and the broker sends its retained message as soon as
+# we do, then every update after that. REST polling only runs while the broker
+# can't be reached.
+try:
+    from local_secrets import MQTT_SERVER, MQTT_PORT, MQTT_USER, MQTT_PASSWORD, MQTT_SSL
+    push_available = True
+except ImportError:
+    push_available = False
+
+MQTT_TOPIC_PREFIX = "unicorn/text/"  # followed by the board's unique id
+PUSH_RETRY_INTERVAL = 60  # seconds between attempts to reach the broker
+push_topic = None
+push_connected = False
+
+# --- Scroll Strip Cache ---
+# The message is rasterised once into an off-screen strip the full width of the
+# scrolled text (msg_width + 2 * padding) and each frame just copies a WIDTH
+# column window of it into the framebuffer, so frame time no longer depends on
+# how long the message is. The strip is rebuilt only when its key changes.
+# A message too long for a strip of MAX_STRIP_BYTES, or one there isn't the
+# memory for, is drawn with text() every frame instead, as it used to be.
+MAX_STRIP_BYTES = 32 * 1024
+strip = None
+strip_key = None
+strip_width = WIDTH
+msg_width = 0
 
 # --- Helper Functions ---
 
@@ -63,7 +110,7 @@ def blink(colour):
 
 def show_error(message):
     """Display an error message and blink."""
-    print(f"ERROR: {message}")
+    log.error("%s", message)
     gu.set_brightness(1.0)
     graphics.set_font("bitmap8")
 
@@ -94,9 +141,11 @@ def show_error(message):
             blink_state = not blink_state
             sleep(1.0)
 
-def connect_to_wifi(timeout=10):
-    print("Connecting to WiFi...")
-    blink(RED)
+async def connect_to_wifi(timeout=10, quiet=False):
+    """Connect to Wi-Fi. If quiet, don't blink or show_error(); just return whether it worked."""
+    log.info("Connecting to WiFi...")
+    if not quiet:
+        blink(RED)
 
     wlan = network.WLAN(network.STA_IF)
     wlan.active(True)
@@ -105,44 +154,285 @@ def connect_to_wifi(timeout=10):
     start_time = time()
     while not wlan.isconnected():
         if time() - start_time > timeout:
+            if quiet:
+                log.warning("WiFi not connected yet, will try again on the next refresh")
+                return False
             show_error("Failed to connect to WiFi")
-        sleep(0.5)
+        await asyncio.sleep(0.5)
 
-    print("Connected to WiFi")
-    blink(GREEN)
+    log.info("Connected to WiFi")
+    if not quiet:
+        blink(GREEN)
+    return True
 
-def get_text_from_web():
-    print("Getting text from web...")
-    blink(ORANGE)
+def load_cache():
+    """Load the cached text and validators from flash, if there are any."""
+    global cached_text, etag, last_modified
+
+    try:
+        with open(CACHE_FILE) as f:
+            cache = json.load(f)
+        cached_text = cache["text"]
+        etag = cache.get("etag")
+        last_modified = cache.get("last_modified")
+        log.info("Loaded cached text: %s", cached_text)
+    except (OSError, ValueError, KeyError) as e:
+        log.info("No usable text cache: %s", e)
+
+def save_cache(text, new_etag, new_last_modified):
+    """Remember text and its validators, only writing to flash if something changed."""
+    global cached_text, etag, last_modified
+
+    if (text, new_etag, new_last_modified) == (cached_text, etag, last_modified):
+        return
+    cached_text, etag, last_modified = text, new_etag, new_last_modified
+
+    try:
+        with open(CACHE_FILE, "w") as f:
+            json.dump({"text": text, "etag": etag, "last_modified": last_modified}, f)
+    except OSError as e:
+        log.warning("Could not save text cache: %s", e)
+
+async def get_text_from_web():
+    """Fetch the message text without blocking the display. Returns None on failure.
+
+    Sends the cached validators so an unchanged message costs a 304 and no
+    JSON parsing; in that case the cached text is returned.
+    """
+    log.info("Getting text from web...")
 
     headers = {
         "Authorization": "Bearer "+BEARER_TOKEN
     }
+    if cached_text is not None:
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
 
     try:
-        response = urequests.get(URL, headers=headers)
-        full_response = response.json()
+        status, response_headers, body = await ahttp.get(URL, headers=headers)
+        if status == 304 and cached_text is not None:
+            log.info("Text not modified")
+            return cached_text
+
+        if status != 200:
+            log.warning("Unexpected HTTP status: %s", status)
+            return None
+
+        full_response = json.loads(body)
 
         if 'text' not in full_response:
-            show_error("No text in response")
+            log.warning("No text in response")
+            return None
 
         my_message = full_response['text']
-        print(f"Got text: {my_message}")
-        blink(WHITE)
+        log.info("Got text: %s", my_message)
+        save_cache(my_message, response_headers.get("etag"), response_headers.get("last-modified"))
         return my_message
 
     except Exception as e:
-        print(f"Exception during web request: {e}")
-        show_error("Failed to fetch text")
+        log.warning("Exception during web request: %s", e)
+        return None
+
+
+def set_message(text):
+    """Swap in new message text and restart the scroll if it changed.
+
+    This is a single assignment, so the render loop only ever sees the old
+    or the new message.
+    """
+    global message_text, shift, state
+
+    if text != message_text:
+        message_text = text
+        shift = 0
+        state = STATE_PRE_SCROLL
+
+
+async def refresh_text():
+    """Background task: refresh message_text every REFRESH_INTERVAL or on request.
+
+    Timed refreshes are skipped while push delivery is connected. If Wi-Fi
+    isn't connected, e.g. the join at start up failed, a refresh tries to
+    join again first and is skipped if that fails too.
+    """
+    while True:
+        try:
+            await asyncio.wait_for(refresh_requested.wait(), REFRESH_INTERVAL)
+        except asyncio.TimeoutError:
+            if push_connected:
+                continue
+            log.info("Auto-refresh text...")
+        refresh_requested.clear()
+
+        if not network.WLAN(network.STA_IF).isconnected():
+            if not await connect_to_wifi(quiet=True):
+                continue
+
+        new_text = await get_text_from_web()
+        if new_text is not None:
+            set_message(new_text)
+
+
+def on_push_message(topic, msg, retained):
+    text = msg.decode()
+    log.info("Pushed text%s: %s", " (retained)" if retained else "", text)
+    if not text:
+        return  # retained message cleared on the broker
+    save_cache(text, None, None)
+    set_message(text)
+
+
+async def on_push_state(up):
+    global push_connected
+    push_connected = up
+    log.info("Push delivery %s", "up" if up else "down, falling back to polling")
+
+
+async def on_push_connect(client):
+    # clean sessions mean we must (re)subscribe on every connection. The
+    # topic goes as bytes, which mqtt_as writes out as they are (the host
+    # emulator's CPython can't take a memoryview of a str)
+    await client.subscribe(push_topic.encode(), 1)
+
+
+async def broker_reachable(timeout=5):
+    """Whether the broker accepts a TCP connection, tried without mqtt_as."""
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(MQTT_SERVER, MQTT_PORT), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    await writer.wait_closed()
+    return True
+
+
+async def push_text():
+    """Background task: receive text from the MQTT broker.
+
+    Every PUSH_RETRY_INTERVAL while push delivery is down, probes the broker
+    with a plain TCP connection and connects to it when it answers. mqtt_as
+    reports the connection going down via on_push_state.
+    """
+    global push_topic
+    from mqtt_as import MQTTClient, config
+
+    class PushClient(MQTTClient):
+        # mqtt_as joins Wi-Fi again on its first connect, dropping the link
+        # if that takes too long, and drops and rejoins it before every
+        # reconnect. main.py has already joined and REST polling needs the
+        # link while the broker is down, so Wi-Fi is left alone here and
+        # push_text() does the reconnecting.
+        async def wifi_connect(self, quick=False):
+            if not self._sta_if.isconnected():
+                raise OSError("Wi-Fi not connected")
+
+        async def _keep_connected(self):
+            pass
+
+    push_topic = MQTT_TOPIC_PREFIX + config['client_id'].decode()
+    log.info("Push topic: %s", push_topic)
+
+    config['server'] = MQTT_SERVER
+    config['port'] = MQTT_PORT
+    config['user'] = MQTT_USER
+    config['password'] = MQTT_PASSWORD
+    config['ssl'] = MQTT_SSL
+    config['ssid'] = WIFI_SSID
+    config['wifi_pw'] = WIFI_PASSWORD
+    config['subs_cb'] = on_push_message
+    config['wifi_coro'] = on_push_state
+    config['connect_coro'] = on_push_connect
+    config['clean'] = True
+    client = PushClient(config)
+
+    while True:
+        if not push_connected:
+            if not await broker_reachable():
+                log.warning("MQTT broker unreachable, polling instead")
+            else:
+                try:
+                    await client.connect()
+                except (OSError, asyncio.TimeoutError) as e:
+                    log.warning("MQTT connect failed (%s), polling instead", e)
+        await asyncio.sleep(PUSH_RETRY_INTERVAL)
 
 
 def outline_text(text, x, y, properties):
     message_colour = properties["message_colour"]
 
-    graphics.set_pen(graphics.create_pen(*message_colour))
+    graphics.set_pen(pens.pen(*message_colour))
     graphics.text(text, x, y, -1, 1)
 
 
+def build_strip(text, properties):
+    """Render text into the scroll strip cache unless it is already there."""
+    global strip, strip_key, strip_width, msg_width
+
+    padding = properties["padding"]
+    key = (text, properties["message_colour"], properties["background_colour"], padding)
+    if key == strip_key:
+        return
+
+    msg_width = graphics.measure_text(text, 1)
+    strip_width = max(WIDTH, msg_width + padding * 2)
+    strip_key = key
+
+    fb = memoryview(graphics)
+    bpp = len(fb) // (WIDTH * HEIGHT)
+    fb_row = WIDTH * bpp
+    strip_row = strip_width * bpp
+
+    # let the old strip go before asking for the new one
+    strip = None
+    gc.collect()
+    if strip_row * HEIGHT > MAX_STRIP_BYTES:
+        log.info("Message too long for a strip, drawing it directly")
+        return
+    try:
+        strip = memoryview(bytearray(strip_row * HEIGHT))
+    except MemoryError:
+        log.warning("No memory for a %d byte strip, drawing the message directly", strip_row * HEIGHT)
+        return
+
+    # Rasterise the message one screen-width at a time and copy each slice
+    # of the framebuffer into its place in the strip
+    bg_pen = pens.pen(*properties["background_colour"])
+    for offset in range(0, strip_width, WIDTH):
+        graphics.set_pen(bg_pen)
+        graphics.clear()
+        outline_text(text, x=padding - offset, y=TEXT_Y_POSITION, properties=properties)
+
+        n = min(WIDTH, strip_width - offset) * bpp
+        for y in range(HEIGHT):
+            start = y * strip_row + offset * bpp
+            strip[start:start + n] = fb[y * fb_row:y * fb_row + n]
+
+
+def blit_strip(shift, text, properties):
+    """Copy the WIDTH column window of the strip starting at shift to the display.
+
+    Without a strip, the text is drawn at that scroll position instead.
+    """
+    if strip is None:
+        graphics.set_pen(pens.pen(*properties["background_colour"]))
+        graphics.clear()
+        outline_text(text, x=properties["padding"] - shift, y=TEXT_Y_POSITION, properties=properties)
+        return
+
+    fb = memoryview(graphics)
+    bpp = len(fb) // (WIDTH * HEIGHT)
+    fb_row = WIDTH * bpp
+    strip_row = strip_width * bpp
+
+    shift = min(max(shift, 0), strip_width - WIDTH)
+    start = shift * bpp
+    for y in range(HEIGHT):
+        fb[y * fb_row:(y + 1) * fb_row] = strip[start:start + fb_row]
+        start += strip_row
+
+
 def default_setup():
     return {
         "padding": 5,
@@ -154,40 +444,46 @@ def default_setup():
     }
 
 # --- Button Handler Function ---
+dump_pressed = False  # the sleep button prints the recent log messages, once per press
+
 def handle_buttons():
-    global message_text, shift, state, message_colour_index, paused, last_button_check
+    global message_text, shift, state, message_colour_index, paused, last_button_check, dump_pressed
 
     if ticks_diff(ticks_ms(), last_button_check) > 200:
         if gu.is_pressed(GalacticUnicorn.SWITCH_A):
-            print("[Button A] Refresh text manually.")
-            message_text = get_text_from_web()
+            log.info("[Button A] Refresh text manually.")
+            refresh_requested.set()
             shift = 0
             state = STATE_PRE_SCROLL
 
         if gu.is_pressed(GalacticUnicorn.SWITCH_B):
-            print("[Button B] Cycle text colour.")
+            log.info("[Button B] Cycle text colour.")
             message_colour_index = (message_colour_index + 1) % len(message_colours)
             setup_values["message_colour"] = message_colours[message_colour_index]
 
         if gu.is_pressed(GalacticUnicorn.SWITCH_C):
             paused = not paused
-            print(f"[Button C] {'Paused' if paused else 'Resumed'} scrolling.")
+            log.info("[Button C] %s scrolling.", "Paused" if paused else "Resumed")
 
         if gu.is_pressed(GalacticUnicorn.SWITCH_D):
-            print("[Button D] Show local custom message.")
+            log.info("[Button D] Show local custom message.")
             message_text = local_message
             shift = 0
             state = STATE_PRE_SCROLL
 
+        if gu.is_pressed(GalacticUnicorn.SWITCH_SLEEP) != dump_pressed:
+            dump_pressed = not dump_pressed
+            if dump_pressed:
+                log.dump()
+
         last_button_check = ticks_ms()
 
 # --- Main Display Function ---
-def display_text(initial_text="", initial_brightness=0.5, setup=None):
+async def display_text(initial_text="", initial_brightness=0.5, setup=None):
     global message_text, shift, state, paused, message_colour_index, message_colours, local_message, last_button_check, setup_values
     setup_values = setup or default_setup()
 
     last_time = ticks_ms()
-    last_request = time()
     message_text = initial_text
     shift = 0
     state = STATE_PRE_SCROLL
@@ -221,12 +517,8 @@ def display_text(initial_text="", initial_brightness=0.5, setup=None):
 
         handle_buttons()
 
-        if now - last_request > 30:
-            print("Auto-refresh text...")
-            message_text = get_text_from_web()
-            last_request = now
-
-        msg_width = graphics.measure_text(message_text, 1)
+        # Re-render the strip only if the text or its colours changed
+        build_strip(message_text, setup_values)
 
         # Manual brightness buttons
         if gu.is_pressed(GalacticUnicorn.SWITCH_BRIGHTNESS_UP):
@@ -251,17 +543,13 @@ def display_text(initial_text="", initial_brightness=0.5, setup=None):
                 shift = 0
                 last_time = ticks_ms()
 
-        # Background
-        graphics.set_pen(graphics.create_pen(*setup_values["background_colour"]))
-        graphics.clear()
-
         # Outline colour cycling
         if now - last_outline_change > 10:
             outline_index = (outline_index + 1) % len(outline_colours)
             setup_values["outline_colour"] = outline_colours[outline_index]
             last_outline_change = now
 
-        outline_text(message_text, x=setup_values["padding"] - shift, y=TEXT_Y_POSITION, properties=setup_values)
+        blit_strip(shift, message_text, setup_values)
 
         # Heartbeat pulse
         pulse += 0.003 * pulse_direction
@@ -272,8 +560,39 @@ def display_text(initial_text="", initial_brightness=0.5, setup=None):
         gu.set_brightness(initial_brightness + pulse)
 
         gu.update(graphics)
-        sleep(0.001)
+
+        # Yield to the background refresh task
+        await asyncio.sleep_ms(1)
 
 # --- Main Program ---
-connect_to_wifi()
-display_text(initial_text=get_text_from_web())
+async def connect_then_refresh():
+    await connect_to_wifi(quiet=True)
+    refresh_requested.set()
+    if push_available:
+        asyncio.create_task(push_text())
+
+async def main():
+    load_cache()
+
+    if cached_text is not None:
+        # Show the cached message straight away; Wi-Fi and the first fetch
+        # happen in the background and swap the text in if it has changed
+        asyncio.create_task(refresh_text())
+        asyncio.create_task(connect_then_refresh())
+        await display_text(initial_text=cached_text)
+        return
+
+    await connect_to_wifi()
+
+    blink(ORANGE)
+    initial_text = await get_text_from_web()
+    if initial_text is None:
+        show_error("Failed to fetch text")
+    blink(WHITE)
+
+    asyncio.create_task(refresh_text())
+    if push_available:
+        asyncio.create_task(push_text())
+    await display_text(initial_text=initial_text)
+
+asyncio.run(main())
@@ -2,6 +2,9 @@ import time
 import machine
 from galactic import GalacticUnicorn
 from picographics import PicoGraphics, DISPLAY_GALACTIC_UNICORN as DISPLAY
+from pens import pen_cache
+from scheduler import FrameScheduler
+from registry import EffectRegistry
 
 # overclock to 200Mhz
 machine.freq(200000000)
@@ -9,9 +12,28 @@ machine.freq(200000000)
 # create galactic object and graphics surface for drawing
 galactic = GalacticUnicorn()
 graphics = PicoGraphics(DISPLAY)
+pens = pen_cache(graphics)
 
 brightness = 0.5
 
+# frame rate the effects are paced to; VOLUME UP toggles an fps overlay and
+# the achieved rate and frame times are printed every STATS_REPORT_MS
+TARGET_FPS = 60
+STATS_REPORT_MS = 5000
+scheduler = FrameScheduler(TARGET_FPS, STATS_REPORT_MS)
+show_stats = False
+was_stats_pressed = False
+overlay_shown = False
+
+# effects are imported the first time their button is pressed and stay
+# loaded, within EFFECT_BUDGET bytes of heap, so switching back is instant
+EFFECT_BUDGET = 48 * 1024
+effects = EffectRegistry(graphics, EFFECT_BUDGET)
+effects.register(GalacticUnicorn.SWITCH_A, "rain")
+effects.register(GalacticUnicorn.SWITCH_B, "fire")
+effects.register(GalacticUnicorn.SWITCH_C, "rainbow")
+effects.register(GalacticUnicorn.SWITCH_D, "supercomputer")
+
 
 # returns the id of the button that is currently pressed or
 # None if none are
@@ -30,9 +52,9 @@ def pressed():
 # wait for a button to be pressed and load that effect
 while True:
     graphics.set_font("bitmap6")
-    graphics.set_pen(graphics.create_pen(0, 0, 0))
+    graphics.set_pen(pens.pen(0, 0, 0))
     graphics.clear()
-    graphics.set_pen(graphics.create_pen(155, 155, 155))
+    graphics.set_pen(pens.pen(155, 155, 155))
     graphics.text("PRESS", 12, -1, -1, 1)
     graphics.text("A B C OR D!", 2, 5, -1, 1)
 
@@ -46,28 +68,26 @@ while True:
     galactic.set_brightness(brightness)
     galactic.update(graphics)
 
-    if pressed() == GalacticUnicorn.SWITCH_A:
-        import rain as effect
-        break
-    if pressed() == GalacticUnicorn.SWITCH_B:
-        import clock_mod as effect  # noqa: F811
-        break
-    if pressed() == GalacticUnicorn.SWITCH_C:
-        import rainbow as effect        # noqa: F811
-        break
-    if pressed() == GalacticUnicorn.SWITCH_D:
-        import text_from_web as effect    # noqa: F811
+    button = pressed()
+    if button is not None:
         break
 
     # pause for a moment
     time.sleep(0.01)
 
-# wait until all buttons are released
-while pressed() is not None:
-    time.sleep(0.1)
 
-effect.graphics = graphics
-effect.init()
+# load (or switch back to) the effect for a button
+def switch_to(button):
+    global effect
+    start = time.ticks_ms()
+    effect = effects.activate(button)
+    print("[{}] switched in {}ms, {}".format(effect.__name__, time.ticks_diff(time.ticks_ms(), start),
+                                             effects.stats()))
+    scheduler.reset(effect.__name__)
+
+
+switch_to(button)
+last_button = button
 
 sleep = False
 was_sleep_pressed = False
@@ -75,9 +95,18 @@ was_sleep_pressed = False
 
 # wait
 while True:
-    # if A, B, C, or D are pressed then reset
-    if pressed() is not None:
-        machine.reset()
+    scheduler.start_frame()
+
+    # if A, B, C, or D are pressed then switch to that effect
+    button = pressed()
+    if button is not None and button != last_button:
+        switch_to(button)
+    last_button = button
+
+    stats_pressed = galactic.is_pressed(GalacticUnicorn.SWITCH_VOLUME_UP)
+    if stats_pressed and not was_stats_pressed:
+        show_stats = not show_stats
+    was_stats_pressed = stats_pressed
 
     sleep_pressed = galactic.is_pressed(GalacticUnicorn.SWITCH_SLEEP)
     if sleep_pressed and not was_sleep_pressed:
@@ -97,6 +126,15 @@ while True:
     else:
         effect.draw()
 
+        if show_stats:
+            scheduler.draw_overlay(graphics, pens.pen(255, 255, 255))
+
+        # effects with a shadow framebuffer only redraw pixels they changed,
+        # so make them redraw everything while the overlay is (or was) on top
+        if (show_stats or overlay_shown) and hasattr(effect, "fb"):
+            effect.fb.invalidate()
+        overlay_shown = show_stats
+
         # update the display
         galactic.update(graphics)
 
@@ -109,5 +147,5 @@ while True:
 
         galactic.set_brightness(brightness)
 
-    # pause for a moment (important or the USB serial device will fail
-    time.sleep(0.001)
+    # wait out the rest of the frame (this also keeps the USB serial device alive)
+    scheduler.end_frame()
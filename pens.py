@@ -0,0 +1,93 @@
+# pens.py - a shared, bounded cache of PicoGraphics pens
+#
+# Render loops used to call graphics.create_pen() for every pixel or every
+# frame, even for colours they had created many times before. PenCache hands
+# back the pen it already made for an (r, g, b), keyed by the packed RGB
+# value (components truncated and masked to a byte, as create_pen does), and
+# keeps at most `capacity` of them.
+#
+# Eviction uses the CLOCK algorithm, a cheap approximation of least recently
+# used: each slot has a "recently used" bit set on every hit, and the
+# eviction hand skips (and clears) slots with the bit set. That keeps both
+# hits and misses O(1) without needing an ordered dict.
+#
+#   from pens import pen_cache
+#   pens = pen_cache(graphics)
+#   graphics.set_pen(pens.pen(255, 140, 0))
+#   print(pens.hits, pens.misses, pens.evictions)
+
+DEFAULT_CAPACITY = 256
+
+
+class PenCache:
+    def __init__(self, graphics, capacity=DEFAULT_CAPACITY):
+        self.graphics = graphics
+        self.capacity = capacity
+        self._slots = {}                  # packed rgb -> slot
+        self._keys = [None] * capacity    # slot -> packed rgb
+        self._pens = [0] * capacity       # slot -> pen
+        self._used = bytearray(capacity)  # slot -> recently used bit
+        self._hand = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def pen(self, r, g, b):
+        """Return a pen for the colour, creating it only if it isn't cached.
+
+        Components are truncated to ints and masked to a byte, as create_pen
+        does, so floats work and out of range values can't collide.
+        """
+        r = int(r) & 0xFF
+        g = int(g) & 0xFF
+        b = int(b) & 0xFF
+        key = (r << 16) | (g << 8) | b
+        slot = self._slots.get(key)
+        if slot is not None:
+            self._used[slot] = 1
+            self.hits += 1
+            return self._pens[slot]
+
+        self.misses += 1
+        slot = self._free_slot()
+        pen = self.graphics.create_pen(r, g, b)
+        self._slots[key] = slot
+        self._keys[slot] = key
+        self._pens[slot] = pen
+        self._used[slot] = 1
+        return pen
+
+    def _free_slot(self):
+        used = self._used
+        hand = self._hand
+        while used[hand]:
+            used[hand] = 0
+            hand = (hand + 1) % self.capacity
+        self._hand = (hand + 1) % self.capacity
+
+        old = self._keys[hand]
+        if old is not None:
+            del self._slots[old]
+            self.evictions += 1
+        return hand
+
+    def clear(self):
+        self._slots = {}
+        self._keys = [None] * self.capacity
+        self._used = bytearray(self.capacity)
+        self._hand = 0
+
+    def stats(self):
+        return {"size": len(self._slots), "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions}
+
+
+_caches = {}
+
+
+def pen_cache(graphics):
+    """The shared PenCache for a graphics surface, so every module reuses the same pens."""
+    cache = _caches.get(id(graphics))
+    if cache is None or cache.graphics is not graphics:
+        cache = _caches[id(graphics)] = PenCache(graphics)
+    return cache
@@ -0,0 +1,111 @@
+# pixelstream.py - hand a whole frame of RGB bytes to PicoGraphics at once
+#
+# Effects that repaint every pixel every frame end up making a set_pen() and a
+# pixel() call per pixel, over a thousand method calls a frame. Instead such
+# an effect can fill PixelStream.frame, a pre-sized bytearray, and call
+# present() once.
+#
+# The frame is kept in the byte order of the RGB888 framebuffer the Galactic
+# Unicorn uses: row-major, 4 bytes per pixel, little-endian 0x00RRGGBB, i.e.
+# B, G, R, 0. So present() puts it on the display with a single memoryview
+# slice assignment, of the whole frame or of just the span of pixels that
+# changed, with no per-pixel work at all. For any other surface it
+# falls back to drawing calls, using as few as it can: the most common colour
+# is drawn with one clear(), and the remaining pixels are grouped by colour so
+# each pen is set once, with runs of a colour along a row drawn by
+# pixel_span(). host/check_stream.py checks both paths draw exactly what a
+# set_pen() + pixel() per pixel would.
+#
+#   stream = PixelStream(graphics, width, height)
+#   o = (y * width + x) * 4
+#   frame = stream.frame
+#   frame[o] = b
+#   frame[o + 1] = g
+#   frame[o + 2] = r            # frame[o + 3] stays 0
+#   stream.present()            # or present(start, end) for pixels start..end-1
+
+from pens import pen_cache
+
+BYTES_PER_PIXEL = 4  # B, G, R, 0, as in the PicoGraphics RGB888 framebuffer
+
+
+class PixelStream:
+    def __init__(self, graphics, width, height, bulk=True):
+        self.graphics = graphics
+        self.width = width
+        self.height = height
+        self.size = width * height
+        self.frame = bytearray(self.size * BYTES_PER_PIXEL)
+        self.view = memoryview(self.frame)
+        self.fb = None
+        if bulk:
+            try:
+                fb = memoryview(graphics)
+            except TypeError:
+                fb = None
+            if fb is not None and len(fb) == self.size * BYTES_PER_PIXEL:
+                self.fb = fb
+        # for checking how much work present() does
+        self.pen_changes = 0
+        self.draw_calls = 0
+
+    def present(self, start=0, end=None):
+        """Put pixels start to end - 1 of the frame (all of it by default) on the
+        graphics surface; galactic.update() still shows it."""
+        if self.fb is not None:
+            if end is None:
+                end = self.size
+            self.fb[start * BYTES_PER_PIXEL:end * BYTES_PER_PIXEL] = \
+                self.view[start * BYTES_PER_PIXEL:end * BYTES_PER_PIXEL]
+            self.draw_calls += 1
+        else:
+            # drawing calls can't leave the rest of the surface alone after a
+            # clear(), so the fallback always draws the whole frame
+            self._draw()
+
+    def _draw(self):
+        frame = self.frame
+        width = self.width
+        graphics = self.graphics
+        pens = pen_cache(graphics)
+
+        # runs of one colour along each row, as (y, x, length) per packed colour
+        runs = {}
+        counts = {}
+        for y in range(self.height):
+            o = y * width * BYTES_PER_PIXEL
+            x = 0
+            while x < width:
+                colour = frame[o + 2] << 16 | frame[o + 1] << 8 | frame[o]
+                start = x
+                x += 1
+                o += BYTES_PER_PIXEL
+                while x < width and (frame[o + 2] << 16 | frame[o + 1] << 8 | frame[o]) == colour:
+                    x += 1
+                    o += BYTES_PER_PIXEL
+                run = runs.get(colour)
+                if run is None:
+                    run = runs[colour] = []
+                    counts[colour] = 0
+                run.append((y, start, x - start))
+                counts[colour] += x - start
+
+        # the most common colour goes down first, in one clear()
+        background = max(counts, key=counts.get)
+        graphics.set_pen(pens.pen(background >> 16, background >> 8 & 0xFF, background & 0xFF))
+        graphics.clear()
+        self.pen_changes += 1
+        self.draw_calls += 1
+
+        for colour, run in runs.items():
+            if colour == background:
+                continue
+            graphics.set_pen(pens.pen(colour >> 16, colour >> 8 & 0xFF, colour & 0xFF))
+            self.pen_changes += 1
+            for y, x, length in run:
+                if length == 1:
+                    graphics.pixel(x, y)
+                else:
+                    graphics.pixel_span(x, y, length)
+            self.draw_calls += len(run)
+
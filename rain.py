@@ -6,78 +6,130 @@
 # Copyright (C) 2022 Pete Favelle <ahnlak@gmail.com>
 # Released under the MIT License; see LICENSE for details
 
-from math import trunc
 from random import randint
-from time import sleep
+from time import ticks_ms, ticks_diff
 from galactic import GalacticUnicorn
-from picographics import PicoGraphics, DISPLAY_GALACTIC_UNICORN
-
-# Create the Unicorn object and the graphics surface
-galactic = GalacticUnicorn()
-graphics = PicoGraphics(DISPLAY_GALACTIC_UNICORN)
-
-# We'll maintain a list of raindrops
-raindrops = []
-palette = [
-  graphics.create_pen(255, 255, 255),
-  graphics.create_pen( 50,  50, 150),
-  graphics.create_pen( 40,  40, 100),
-  graphics.create_pen( 30,  30,  80),
-  graphics.create_pen( 20,  20,  50),
-  graphics.create_pen( 10,  10,  20),
-  graphics.create_pen(  5,   5,  10),
-]
-
-
-# Small class to wrangle said raindrops
-class Raindrop:
-  def __init__(self, x, y):
-    self.x = x
-    self.y = y
-    self.lifespan = 1
-
-  def draw(self):
-    # Set the right colour, based on our age
-    graphics.set_pen(palette[self.lifespan])
-
-    graphics.circle(self.x, self.y, self.lifespan)
-    if self.lifespan > 1:
-      graphics.set_pen(graphics.create_pen(0, 0, 0))
-      graphics.circle(self.x, self.y, self.lifespan-1)
-    if self.lifespan > 4:
-      graphics.set_pen(palette[self.lifespan])
-      graphics.circle(self.x, self.y, 1)
-
-  def update(self):
-    self.lifespan += 1
-
-  def is_alive(self):
-    return self.lifespan < 7
-
-
-# So, the main loop - we check to see if we need new raindrops, then
-# render through them all, and ... breathe
-while True:
 
-  # Clear the screen so we know what we're doing
-  graphics.set_pen(graphics.create_pen(0, 0, 0))
-  graphics.clear()
-
-  # Clear out any expired raindrops
-  raindrops = [drop for drop in raindrops if drop.is_alive()]
+# This is an effect for main_choose.py, which sets graphics and then calls
+# init() once and draw() every frame. The rain moves on every STEP_MS of
+# wall time however often draw() is called, so the host can redraw as fast
+# as it likes without speeding the rain up.
+graphics = None
+
+STEP_MS = 150
+MAX_CATCH_UP = 7  # steps to run at most after a long gap (a drop's lifetime)
+
+palette = None
+BLACK = None
+sprites = None
+
+# Raindrops live in a fixed-size pool of parallel arrays, oldest first, so
+# nothing is allocated once we're running (and the GC never pauses us). A
+# drop can be added each step while there are fewer than 4-10 of them, so
+# there are never more than MAX_DROPS.
+MAX_DROPS = 10
+LIFESPAN = 7
+drop_x = bytearray(MAX_DROPS)
+drop_y = bytearray(MAX_DROPS)
+drop_age = bytearray(MAX_DROPS)
+drop_count = 0
+
+last_ms = 0
+elapsed_ms = 0
+first_draw = True
+
+
+def init():
+  global palette, BLACK, sprites, drop_count, last_ms, elapsed_ms, first_draw
+
+  # Palette of colours by raindrop age
+  palette = [
+    graphics.create_pen(255, 255, 255),
+    graphics.create_pen( 50,  50, 150),
+    graphics.create_pen( 40,  40, 100),
+    graphics.create_pen( 30,  30,  80),
+    graphics.create_pen( 20,  20,  50),
+    graphics.create_pen( 10,  10,  20),
+    graphics.create_pen(  5,   5,  10),
+  ]
+  BLACK = graphics.create_pen(0, 0, 0)
+
+  # What to draw for a drop of each age, worked out up front: a ring in the
+  # age's colour (a filled circle with a black one inside it), and a dot back
+  # in the middle once it's big enough. Each step is (pen, radius).
+  sprites = [()]
+  for lifespan in range(1, LIFESPAN):
+    sprite = [(palette[lifespan], lifespan)]
+    if lifespan > 1:
+      sprite.append((BLACK, lifespan - 1))
+    if lifespan > 4:
+      sprite.append((palette[lifespan], 1))
+    sprites.append(tuple(sprite))
+  sprites = tuple(sprites)
+
+  drop_count = 0
+  last_ms = ticks_ms()
+  elapsed_ms = STEP_MS  # so the first draw() starts the rain
+  first_draw = True
+
+
+def add_drop(x, y):
+  global drop_count
+  drop_x[drop_count] = x
+  drop_y[drop_count] = y
+  drop_age[drop_count] = 1
+  drop_count += 1
+
+
+def step():
+  # Age the drops, shuffle the live ones down over the dead ones (keeping
+  # their order), and maybe start a new one
+  global drop_count
+  live = 0
+  for i in range(drop_count):
+    age = drop_age[i] + 1
+    if age < LIFESPAN:
+      drop_x[live] = drop_x[i]
+      drop_y[live] = drop_y[i]
+      drop_age[live] = age
+      live += 1
+  drop_count = live
 
   # Do we have enough raindrops?
-  if len(raindrops) < randint(4, 10):
-    newdrop=Raindrop(1,2)
-    raindrops.append(Raindrop(randint(0,GalacticUnicorn.WIDTH),randint(0,GalacticUnicorn.HEIGHT)))
+  if drop_count < randint(4, 10):
+    add_drop(randint(0, GalacticUnicorn.WIDTH), randint(0, GalacticUnicorn.HEIGHT))
+
+
+def draw(dt=None):
+  # dt is the milliseconds since the last draw(); if the host doesn't pass
+  # it we measure it ourselves
+  global last_ms, elapsed_ms, first_draw
+
+  now = ticks_ms()
+  if first_draw:
+    # init() already queued the step that starts the rain; running dt's
+    # worth on top would start it a step ahead
+    dt = 0
+    first_draw = False
+  elif dt is None:
+    dt = ticks_diff(now, last_ms)
+  last_ms = now
+
+  # Advance the rain by however many whole steps of wall time have passed
+  elapsed_ms += dt
+  steps = elapsed_ms // STEP_MS
+  elapsed_ms -= steps * STEP_MS
+  for _ in range(min(steps, MAX_CATCH_UP)):
+    step()
 
-  # So, ask each of those raindrops to render themselves, and update
-  for drop in raindrops:
-    drop.draw()
-    drop.update()
-
-  # And update the screen
-  galactic.update(graphics)
+  # Clear the screen so we know what we're doing
+  graphics.set_pen(BLACK)
+  graphics.clear()
 
-  # Nice. So, breathe...
-  sleep(0.15)
\ No newline at end of file
+  # So, render each raindrop from its sprite
+  for i in range(drop_count):
+    x = drop_x[i]
+    y = drop_y[i]
+    for pen, radius in sprites[drop_age[i]]:
+      graphics.set_pen(pen)
+      graphics.circle(x, y, radius)
@@ -1,5 +1,8 @@
 import time, random, math
+from array import array
 from galactic import GalacticUnicorn
+from pixelstream import PixelStream
+from colour import hsv_to_rgb, HUE_STEPS
 
 graphics = None
 palette = None
@@ -7,53 +10,98 @@ palette = None
 width = GalacticUnicorn.WIDTH
 height = GalacticUnicorn.HEIGHT
 
-@micropython.native  # noqa: F821
-def from_hsv(h, s, v):
-    i = math.floor(h * 6.0)
-    f = h * 6.0 - i
-    v *= 255.0
-    p = v * (1.0 - s)
-    q = v * (1.0 - f * s)
-    t = v * (1.0 - (1.0 - f) * s)
-
-    i = int(i) % 6
-    if i == 0:
-        return int(v), int(t), int(p)
-    if i == 1:
-        return int(q), int(v), int(p)
-    if i == 2:
-        return int(p), int(v), int(t)
-    if i == 3:
-        return int(p), int(q), int(v)
-    if i == 4:
-        return int(t), int(p), int(v)
-    if i == 5:
-        return int(v), int(p), int(q)
-
 phase = 0
-hue_map = [from_hsv(x / width, 1.0, 1.0) for x in range(width)]
+hue_map = [hsv_to_rgb(x * HUE_STEPS // width, 255, 255) for x in range(width)]
 hue_offset = 0.0
 stripe_width = 3.0
 speed = 5.0
 
+# The brightness of a pixel only depends on x + y (its diagonal) and the
+# phase, so instead of a sin() per pixel we keep:
+#   - level_lut: one full period of the brightness curve, SINE_STEPS long,
+#     already quantised to 0..LEVELS-1
+#   - diagonal_steps: how far round that period each diagonal is, which only
+#     changes with stripe_width and is rebuilt lazily when it does
+#   - colour_table: the B, G, R bytes of every hue_map colour at every
+#     brightness level, in the PixelStream frame's byte order
+# and each frame just looks up the 63 diagonal levels and copies colours from
+# the table into a PixelStream frame, which goes to the display in one call.
+SINE_STEPS = 256
+LEVELS = 64
+STEPS_PER_RADIAN = SINE_STEPS / (2 * math.pi)
+
+level_lut = bytearray(
+    int((math.sin(i / STEPS_PER_RADIAN) + 1.5) / 2.5 * (LEVELS - 1) + 0.5) for i in range(SINE_STEPS)
+)
+diagonals = width + height - 1
+diagonal_steps = array('H', bytes(2 * diagonals))
+diagonal_levels = bytearray(diagonals)
+table_stripe_width = None
+colour_table = None
+stream = None
+
+
+def set_speed(new_speed):
+    global speed
+    speed = new_speed
+
+
+def set_stripe_width(new_stripe_width):
+    # the diagonal table is rebuilt on the next draw()
+    global stripe_width
+    stripe_width = new_stripe_width
+
+
+def build_diagonal_steps():
+    global table_stripe_width
+    for d in range(diagonals):
+        diagonal_steps[d] = int(d / stripe_width * STEPS_PER_RADIAN) % SINE_STEPS
+    table_stripe_width = stripe_width
+
 
 def init():
-    pass
+    global colour_table, stream
+    colour_table = bytearray(3 * width * LEVELS)
+    o = 0
+    for h in range(width):
+        colour = hue_map[h]
+        for level in range(LEVELS):
+            v = level / (LEVELS - 1)
+            colour_table[o] = int(colour[2] * v)
+            colour_table[o + 1] = int(colour[1] * v)
+            colour_table[o + 2] = int(colour[0] * v)
+            o += 3
+    stream = PixelStream(graphics, width, height)
+    build_diagonal_steps()
 
 @micropython.native  # noqa: F821
 def draw():
     global hue_offset, phase
-    
+
+    if stripe_width != table_stripe_width:
+        build_diagonal_steps()
+
     phase += speed
-    
-    phase_percent = phase / 15
+
+    # brightness level of each diagonal for this frame
+    base = int(phase / 15 * STEPS_PER_RADIAN)
+    for d in range(diagonals):
+        diagonal_levels[d] = level_lut[(base + diagonal_steps[d]) % SINE_STEPS]
+
+    table = colour_table
+    levels = diagonal_levels
+    frame = stream.frame
+    hue_shift = hue_offset * width
     for x in range(width):
-        colour = hue_map[int((x + (hue_offset * width)) % width)]
+        row = int((x + hue_shift) % width) * LEVELS
+        o = x * 4
         for y in range(height):
-            v = ((math.sin((x + y) / stripe_width + phase_percent) + 1.5) / 2.5)
-
-            graphics.set_pen(graphics.create_pen(int(colour[0] * v), int(colour[1] * v), int(colour[2] * v)))
-            graphics.pixel(x, y)
+            c = (row + levels[x + y]) * 3
+            frame[o] = table[c]
+            frame[o + 1] = table[c + 1]
+            frame[o + 2] = table[c + 2]
+            o += width * 4
+    stream.present()
 
 # hue_map = [from_hsv(x / width, 1.0, 1.0) for x in range(width)]
 # hue_offset = 0.0
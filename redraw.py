@@ -0,0 +1,110 @@
+# redraw.py - per-second redraw planning for the clock faces
+#
+# The clocks used to repaint the whole gradient background and every
+# character of HH:MM:SS each second, although usually only the last digit
+# changes and the background hue moves imperceptibly. RedrawPlanner keeps a
+# copy of the rendered background, keyed by whatever the clock quantises the
+# time of day to, and works out which columns of the text changed:
+#
+#   planner = RedrawPlanner(graphics, width, height)
+#   planner.begin()
+#   if planner.need_background(bucket):
+#       draw_the_background()
+#       planner.save_background(bucket)
+#   for x0, x1 in planner.changed_spans(text, x, measure):
+#       planner.restore(x0, x1)   # background back under those columns
+#       graphics.set_clip(x0, 0, x1 - x0, height)
+#       draw_the_text()
+#       graphics.remove_clip()
+#   planner.end()
+#
+# pixels_touched counts the pixels redrawn in the last redraw, to check that
+# most seconds only touch a digit or two. Call invalidate() when something
+# else has drawn over the clock.
+
+CELL_MARGIN = 1  # columns either side of a character its outline can reach
+
+
+class RedrawPlanner:
+    def __init__(self, graphics, width, height):
+        self.graphics = graphics
+        self.width = width
+        self.height = height
+        self.background = None
+        self.background_key = None
+        self.text = None
+        self.edges = None  # column each character starts at, then where the text ends
+        self.pixels_touched = 0
+        self.redraws = 0
+        self.total_pixels = 0
+
+    def invalidate(self):
+        self.background_key = None
+        self.text = None
+
+    def begin(self):
+        self.pixels_touched = 0
+
+    def end(self):
+        self.redraws += 1
+        self.total_pixels += self.pixels_touched
+
+    def touch(self, pixels):
+        """Count pixels a clock redrew itself, outside restore()."""
+        self.pixels_touched += pixels
+
+    def need_background(self, key):
+        return key != self.background_key
+
+    def save_background(self, key):
+        """Keep what is on the display as the background for key; the text is redrawn in full next."""
+        fb = memoryview(self.graphics)
+        if self.background is None or len(self.background) != len(fb):
+            self.background = bytearray(len(fb))
+        self.background[:] = fb
+        self.background_key = key
+        self.text = None
+
+    def changed_spans(self, text, x, measure):
+        """(x0, x1) column ranges that need redrawing to show text at x.
+
+        measure(s) is the width of s, e.g. lambda s: graphics.measure_text(s, 1).
+        """
+        edges = [x + measure(text[:i]) for i in range(len(text) + 1)]
+        old_text = self.text
+        old_edges = self.edges
+        self.text = text
+        self.edges = edges
+
+        if old_text is None or len(text) != len(old_text) or edges != old_edges:
+            return [(0, self.width)]
+
+        spans = []
+        for i in range(len(text)):
+            if text[i] == old_text[i]:
+                continue
+            x0 = max(edges[i] - CELL_MARGIN, 0)
+            x1 = min(edges[i + 1] + CELL_MARGIN, self.width)
+            if spans and x0 <= spans[-1][1]:
+                spans[-1] = (spans[-1][0], x1)
+            else:
+                spans.append((x0, x1))
+        return spans
+
+    def restore(self, x0, x1):
+        """Copy the saved background back into columns x0 to x1 (exclusive)."""
+        fb = memoryview(self.graphics)
+        bpp = len(fb) // (self.width * self.height)
+        row = self.width * bpp
+        start = x0 * bpp
+        end = x1 * bpp
+        background = memoryview(self.background)
+        for y in range(self.height):
+            fb[start:end] = background[start:end]
+            start += row
+            end += row
+        self.pixels_touched += (x1 - x0) * self.height
+
+    def stats(self):
+        return {"last": self.pixels_touched, "redraws": self.redraws,
+                "average": self.total_pixels // max(self.redraws, 1)}
@@ -0,0 +1,105 @@
+# registry.py - lazily loaded, hot-swappable effects for main_choose.py
+#
+# main_choose.py used to pick an effect with a chain of `import x as effect`
+# statements and machine.reset() the board to pick another one. Instead the
+# registry maps a key (a button) to a module name, imports and init()s the
+# module the first time it is asked for, and keeps recently used effects
+# resident so switching back to one is just a pointer swap.
+#
+# Each effect's cost is measured as the heap it took to import and init().
+# Resident effects are kept within budget_bytes: when loading another one
+# would go over, the least recently used effects are dropped from sys.modules
+# and gc.collect()ed until it fits. A MemoryError while loading evicts
+# everything else and tries once more.
+#
+#   effects = EffectRegistry(graphics, budget_bytes=48 * 1024)
+#   effects.register(GalacticUnicorn.SWITCH_A, "rain")
+#   effect = effects.activate(GalacticUnicorn.SWITCH_A)
+#   effect.draw()
+
+import gc
+import sys
+
+DEFAULT_BUDGET = 48 * 1024
+
+
+class EffectRegistry:
+    def __init__(self, graphics, budget_bytes=DEFAULT_BUDGET):
+        self.graphics = graphics
+        self.budget_bytes = budget_bytes
+        self.names = {}      # key -> module name
+        self.resident = {}   # module name -> module, already init()ed
+        self.costs = {}      # module name -> bytes it took to load
+        self.recent = []     # resident module names, least recently used first
+        self.current = None  # name of the effect being shown
+        self.loads = 0
+        self.evictions = 0
+
+    def register(self, key, name):
+        self.names[key] = name
+
+    def resident_bytes(self):
+        total = 0
+        for name in self.resident:
+            total += self.costs[name]
+        return total
+
+    def activate(self, key):
+        """Return the effect for key, ready to draw(), loading it if it isn't resident."""
+        name = self.names[key]
+        effect = self.resident.get(name)
+        if effect is None:
+            effect = self._load(name)
+        else:
+            self.recent.remove(name)
+            # it has been drawn over since it last flushed its shadow framebuffer
+            if hasattr(effect, "fb"):
+                effect.fb.invalidate()
+        self.recent.append(name)
+        self.current = name
+        return effect
+
+    def _load(self, name):
+        # make room for it using what it cost last time, if it has been loaded before
+        self._evict(self.budget_bytes - self.costs.get(name, 0))
+        try:
+            effect, cost = self._import(name)
+        except MemoryError:
+            self._evict(0)
+            effect, cost = self._import(name)
+
+        self.resident[name] = effect
+        self.costs[name] = cost
+        self.loads += 1
+        # now we know what it really cost, bring everything else back within budget
+        self._evict(self.budget_bytes)
+        return effect
+
+    def _import(self, name):
+        gc.collect()
+        before = gc.mem_alloc()
+        try:
+            effect = __import__(name)
+            effect.graphics = self.graphics
+            effect.init()
+        except BaseException:
+            sys.modules.pop(name, None)
+            raise
+        gc.collect()
+        return effect, max(gc.mem_alloc() - before, 0)
+
+    def _evict(self, limit):
+        """Drop least recently used effects until the rest fit in limit bytes."""
+        evicted = False
+        while self.recent and self.resident_bytes() > limit:
+            name = self.recent.pop(0)
+            del self.resident[name]
+            sys.modules.pop(name, None)
+            self.evictions += 1
+            evicted = True
+        if evicted:
+            gc.collect()
+
+    def stats(self):
+        return {"resident": list(self.recent), "bytes": self.resident_bytes(),
+                "loads": self.loads, "evictions": self.evictions}
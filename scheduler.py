@@ -0,0 +1,109 @@
+# scheduler.py - fixed frame rate pacing and frame-time stats for effects
+#
+# Instead of drawing as fast as possible and then sleeping a fixed 1ms, the
+# host loop brackets each frame with start_frame() / end_frame(). end_frame()
+# waits out whatever is left of the frame's budget (1 / target_fps) with
+# machine.idle(), which lets the core doze until the next interrupt while the
+# display's PIO/DMA and USB keep running. lightsleep() would stop those, so it
+# isn't used.
+#
+# Frame times go into a fixed histogram (no allocation per frame), and every
+# report_ms a line like this is printed to the serial port:
+#   [fire] 60.0 fps (target 60), work p50 4ms p99 9ms max 12ms, 3/600 overran
+#
+#   scheduler = FrameScheduler(target_fps=60)
+#   scheduler.reset("fire")
+#   while True:
+#       scheduler.start_frame()
+#       effect.draw()
+#       galactic.update(graphics)
+#       scheduler.end_frame()
+
+import time
+import machine
+from array import array
+
+BUCKETS = 64  # 1ms histogram buckets; the last one also counts anything slower
+
+
+class FrameScheduler:
+    def __init__(self, target_fps=60, report_ms=10000):
+        self.report_ms = report_ms
+        self.histogram = array('L', [0] * BUCKETS)
+        self.name = ""
+        self.fps = 0.0
+        self.set_target_fps(target_fps)
+        self.reset()
+
+    def set_target_fps(self, target_fps):
+        self.target_fps = target_fps
+        self.budget_us = 1000000 // target_fps
+
+    def reset(self, name=""):
+        """Start stats afresh, e.g. when a different effect is shown."""
+        self.name = name
+        for i in range(BUCKETS):
+            self.histogram[i] = 0
+        self.frames = 0
+        self.overruns = 0
+        self.max_us = 0
+        self.window_start = time.ticks_ms()
+        self.frame_start = time.ticks_us()
+
+    def start_frame(self):
+        self.frame_start = time.ticks_us()
+
+    def end_frame(self):
+        work_us = time.ticks_diff(time.ticks_us(), self.frame_start)
+
+        self.frames += 1
+        self.histogram[min(work_us // 1000, BUCKETS - 1)] += 1
+        if work_us > self.max_us:
+            self.max_us = work_us
+        if work_us > self.budget_us:
+            self.overruns += 1
+
+        # The deadline comes from this frame's start, taken before reset()
+        # restarts the clock, so a report doesn't cost the frame a whole
+        # extra budget.
+        deadline = time.ticks_add(self.frame_start, self.budget_us)
+        if time.ticks_diff(time.ticks_ms(), self.window_start) >= self.report_ms:
+            print(self.report())
+            self.reset(self.name)
+
+        # Wait out the rest of the budget. Always idle at least once so USB
+        # serial gets serviced even when a frame overruns.
+        machine.idle()
+        while time.ticks_diff(deadline, time.ticks_us()) > 0:
+            machine.idle()
+
+    def percentile_ms(self, p):
+        """Frame work time in ms that p (0.0 - 1.0) of this window's frames came in under.
+
+        That's the top of the bucket the percentile falls in, but never more
+        than the window's max, which falls in that bucket or a later one.
+        """
+        max_ms = self.max_us // 1000
+        target = self.frames * p
+        seen = 0
+        for ms in range(BUCKETS):
+            seen += self.histogram[ms]
+            if seen >= target:
+                return min(ms + 1, max_ms)
+        return min(BUCKETS, max_ms)
+
+    def report(self):
+        elapsed_ms = time.ticks_diff(time.ticks_ms(), self.window_start)
+        if elapsed_ms > 0:
+            self.fps = self.frames * 1000 / elapsed_ms
+        return "[{}] {:.1f} fps (target {}), work p50 {}ms p99 {}ms max {}ms, {}/{} overran".format(
+            self.name, self.fps, self.target_fps, self.percentile_ms(0.5), self.percentile_ms(0.99),
+            self.max_us // 1000, self.overruns, self.frames)
+
+    def draw_overlay(self, graphics, pen):
+        """Draw the achieved fps from the last report in the top-right corner."""
+        text = str(int(self.fps))
+        graphics.set_font("bitmap6")
+        graphics.set_pen(pen)
+        width, _ = graphics.get_bounds()
+        graphics.text(text, width - graphics.measure_text(text, 1), 0, -1, 1)
@@ -4,6 +4,7 @@ import math
 from machine import Timer
 from galactic import GalacticUnicorn, Channel
 from picographics import PicoGraphics, DISPLAY_GALACTIC_UNICORN as DISPLAY
+from pens import pen_cache
 
 '''
 Displays some text, gradients and colours and demonstrates button use.
@@ -20,6 +21,7 @@ gc.collect()
 
 gu = GalacticUnicorn()
 graphics = PicoGraphics(DISPLAY)
+pens = pen_cache(graphics)
 
 width = GalacticUnicorn.WIDTH
 height = GalacticUnicorn.HEIGHT
@@ -62,7 +64,7 @@ channels = [gu.synth_channel(i) for i in range(len(notes))]
 def gradient(r, g, b):
     for y in range(0, height):
         for x in range(0, width):
-            graphics.set_pen(graphics.create_pen(int((r * x) / 52), int((g * x) / 52), int((b * x) / 52)))
+            graphics.set_pen(pens.pen(int((r * x) / 52), int((g * x) / 52), int((b * x) / 52)))
             graphics.pixel(x, y)
 
 
@@ -70,7 +72,7 @@ def grid(r, g, b):
     for y in range(0, height):
         for x in range(0, width):
             if (x + y) % 2 == 0:
-                graphics.set_pen(graphics.create_pen(r, g, b))
+                graphics.set_pen(pens.pen(r, g, b))
             else:
                 graphics.set_pen(0)
             graphics.pixel(x, y)
@@ -96,7 +98,7 @@ def outline_text(text):
     graphics.text(text, x, y + 1, -1, 1)
     graphics.text(text, x + 1, y + 1, -1, 1)
 
-    graphics.set_pen(graphics.create_pen(v, v, v))
+    graphics.set_pen(pens.pen(v, v, v))
     graphics.text(text, x, y, -1, 1)
 
 
@@ -303,7 +305,7 @@ while True:
     else:
         was_z_pressed = False
 
-    graphics.set_pen(graphics.create_pen(0, 0, 0))
+    graphics.set_pen(pens.pen(0, 0, 0))
     graphics.clear()
 
     if test == 0:
@@ -1,38 +1,84 @@
 import time, random
+from array import array
 from galactic import GalacticUnicorn
+from framebuffer import ShadowFramebuffer
 
 graphics = None
+fb = None
 
 colour = (230, 150, 0)
 
+# Each cell lights up, holds for 30% of its lifetime, fades out by 50% and
+# stays dark for the rest. Ages and lifetimes are fixed-point, with ONE as
+# 1.0, in flat row-major arrays (index = y * width + x).
+ONE = 4000
+AGE_STEP = 100                  # 0.025 per frame
+LIFETIME_JITTER = ONE // 10     # lifetimes are 1.0 - 1.1
+
+# Random lifetimes are generated up front into a ring buffer rather than
+# calling random for every cell that resets.
+RING_SIZE = 512
+ring = array('H', bytes(2 * RING_SIZE))
+ring_pos = 0
+
+# Palette indexes: dark, then DECAY_LEVELS fading levels (decay 0.0 up to its
+# maximum of 1.1), then fully lit.
+DECAY_LEVELS = 32
+DECAY_DIVISOR = ONE * 11 // 10
+DARK = 0
+LIT = DECAY_LEVELS + 1
+
 def init():
-    global width, height, lifetime, age
+    global width, height, lifetime, age, fb, ring_pos
     width = GalacticUnicorn.WIDTH
     height = GalacticUnicorn.HEIGHT
-    lifetime = [[0.0 for y in range(height)] for x in range(width)]
-    age = [[0.0 for y in range(height)] for x in range(width)]
-    for y in range(height):
-        for x in range(width):
-            lifetime[x][y] = 1.0 + random.uniform(0.0, 0.1)
-            age[x][y] = random.uniform(0.0, 1.0) * lifetime[x][y]
+
+    for i in range(RING_SIZE):
+        ring[i] = ONE + random.randint(0, LIFETIME_JITTER)
+    ring_pos = 0
+
+    lifetime = array('H', bytes(2 * width * height))
+    age = array('H', bytes(2 * width * height))
+    for i in range(width * height):
+        lifetime[i] = ONE + random.randint(0, LIFETIME_JITTER)
+        age[i] = random.randint(0, lifetime[i])
+
+    # pens for every palette index
+    palette = [graphics.create_pen(0, 0, 0)]
+    for level in range(DECAY_LEVELS):
+        decay = level / (DECAY_LEVELS - 1) * DECAY_DIVISOR / ONE
+        palette.append(graphics.create_pen(int(decay * colour[0]), int(decay * colour[1]), int(decay * colour[2])))
+    palette.append(graphics.create_pen(colour[0], colour[1], colour[2]))
+
+    # only the cells whose colour changed get redrawn each frame
+    fb = ShadowFramebuffer(graphics, width, height)
+    fb.set_palette(palette)
 
 @micropython.native  # noqa: F821
 def draw():
-    for y in range(height):
-        for x in range(width):
-            if age[x][y] >= lifetime[x][y]:
-                age[x][y] = 0.0
-                lifetime[x][y] = 1.0 + random.uniform(0.0, 0.1)
-
-            age[x][y] += 0.025
-            
-    for y in range(height):
-        for x in range(width):
-            if age[x][y] < lifetime[x][y] * 0.3:
-                graphics.set_pen(graphics.create_pen(colour[0], colour[1], colour[2]))
-            elif age[x][y] < lifetime[x][y] * 0.5:
-                decay = (lifetime[x][y] * 0.5 - age[x][y]) * 5.0
-                graphics.set_pen(graphics.create_pen(int(decay * colour[0]), int(decay * colour[1]), int(decay * colour[2])))
-            else:
-                graphics.set_pen(0)
-            graphics.pixel(x, y)
\ No newline at end of file
+    global ring_pos
+
+    back = fb.back
+    r = ring_pos
+    for i in range(width * height):
+        a = age[i]
+        lt = lifetime[i]
+        if a >= lt:
+            a = 0
+            lt = ring[r]
+            r = (r + 1) % RING_SIZE
+            lifetime[i] = lt
+
+        a += AGE_STEP
+        age[i] = a
+
+        half = lt >> 1
+        if a * 10 < lt * 3:
+            back[i] = LIT
+        elif a < half:
+            back[i] = 1 + ((half - a) * 5 * (DECAY_LEVELS - 1)) // DECAY_DIVISOR
+        else:
+            back[i] = DARK
+    ring_pos = r
+
+    fb.flush()
@@ -1,69 +1,192 @@
-import json
 import time
 import network
-import urequests
+import log
+import uasyncio as asyncio
 from galactic import GalacticUnicorn
 from picographics import PicoGraphics, DISPLAY_GALACTIC_UNICORN as DISPLAY
+from pens import pen_cache
+from arrivals import fetch_stops, seconds_to_live, TIME_TO_STATION, LINE, DESTINATION
+
+# the stops whose arrivals are merged onto the board, set STOP_IDS in
+# local_secrets.py to use others
+try:
+    from local_secrets import STOP_IDS
+except ImportError:
+    STOP_IDS = ["490007732N"]
 
 '''
 Make request for text
 '''
 def connect_to_wifi():
-    print("Connecting to Wifi")
+    log.info("Connecting to Wifi")
     try:
         from secrets import WIFI_SSID, WIFI_PASSWORD
         wifi_available = True
-        print("wifi available")
+        log.info("wifi available")
     except ImportError:
-        print("Create secrets.py with your WiFi credentials to get time from NTP")
+        log.error("Create secrets.py with your WiFi credentials to get time from NTP")
         wifi_available = False
-        print("no wifi")
+        log.error("no wifi")
 
     wlan = network.WLAN(network.STA_IF)
     wlan.active(True)
     wlan.connect(WIFI_SSID, WIFI_PASSWORD)
-    print("Connected to wifi")
-
-def get_next_arrivals():
-    print("Getting next arrivals")
-    url = "https://api.tfl.gov.uk/StopPoint/490007732N/arrivals"
-    print(url)
-    response = urequests.get(url)
-    print(response.status_code)
-    if response.status_code == 200 and response.json != "[]":
-        nextArrivals = response.json()
-        nextArrivals.sort(key=lambda k: k['timeToStation'], reverse=False)
-
-    print("Got next arrivals")
-    print(nextArrivals)
-    return nextArrivals
-
-
-def build_message_text(arrivals):
-    messageTxt = ""
-    if(len(arrivals) == 0):
-        messageTxt = "No idea when the next bus is..."
+    log.info("Connected to wifi")
+
+# Arrivals count down locally between fetches. The next fetch comes when the
+# soonest bus gets within IMMINENT seconds, then every REFRESH_IMMINENT
+# seconds while it is, or sooner if TfL says a prediction expires (its
+# timeToLive), but otherwise only every REFRESH_IDLE seconds.
+REFRESH_IDLE = 300
+REFRESH_IMMINENT = 30
+REFRESH_EMPTY = 60
+REFRESH_MIN = 15
+IMMINENT = 180
+
+def refresh_delay(arrivals):
+    """Seconds to wait before fetching arrivals again."""
+    if len(arrivals) == 0:
+        return REFRESH_EMPTY
+    soonest = arrivals[0][TIME_TO_STATION]
+    if soonest <= IMMINENT:
+        delay = REFRESH_IMMINENT
     else:
-        busArrivals = []
-        for bus in arrivals:
-            bus_arrival = {}
-            bus_arrival['timeToStation'] = bus['timeToStation']
-            bus_arrival['lineName'] = bus['lineName']
-            #bus_arrival['ttl'] = isoparse(bus['timeToLive'])
-            bus_arrival['ttl'] = bus['timeToLive']
-            bus_arrival['destinationName'] = bus['destinationName']
-            bus_arrival['stopName'] = bus['stationName']
-            bus_arrival['stopCode'] = bus['platformName']
-            busArrivals.append(bus_arrival)
-
+        delay = min(REFRESH_IDLE, soonest - IMMINENT)
     for bus in arrivals:
-
-        minutes = bus['timeToStation']//60
-        seconds = bus['timeToStation']%60
-        messageTxt = messageTxt + '{} {:02d}m{:02d}s {}'.format(bus['lineName'], minutes, seconds, bus['destinationName']) + ' - '
-
-    print(messageTxt)
-    return messageTxt
+        ttl = seconds_to_live(bus)
+        if ttl is not None and ttl < delay:
+            delay = ttl
+    return max(delay, REFRESH_MIN)
+
+
+# the latest arrivals and when they were fetched, published by
+# refresh_arrivals() for the scroll loop to count down from
+arrivals = []
+fetched_ms = time.ticks_ms()
+fetches = 0
+
+def publish_arrivals(new_arrivals):
+    """Hand freshly fetched arrivals to the scroll loop.
+
+    No await happens in here, so the scroll loop never sees the new
+    arrivals with the old fetch time.
+    """
+    global arrivals, fetched_ms, fetches
+    arrivals = new_arrivals
+    fetched_ms = time.ticks_ms()
+    fetches += 1
+
+async def refresh_arrivals():
+    """Background task: fetch the arrivals again whenever refresh_delay() says to.
+
+    The stops are fetched at the same time and each response parsed as it
+    streams in, then merged soonest first keeping only what the board shows,
+    while the scroll loop carries on drawing the arrivals it already has.
+
+    If no stop could be fetched (no Wi-Fi yet, TfL down), the arrivals already
+    shown keep counting down and the fetch is tried again after REFRESH_MIN.
+    """
+    while True:
+        log.info("Getting next arrivals for %s", STOP_IDS)
+        new_arrivals = await fetch_stops(STOP_IDS)
+        if new_arrivals is None:
+            log.warning("No stops answered, trying again in %ds", REFRESH_MIN)
+            await asyncio.sleep(REFRESH_MIN)
+            continue
+        log.info("Got %d arrivals", len(new_arrivals))
+        log.debug("%s", new_arrivals)
+        publish_arrivals(new_arrivals)
+        await asyncio.sleep(refresh_delay(new_arrivals))
+
+
+NO_ARRIVALS = "No idea when the next bus is..."
+
+class MessageSegments:
+    '''
+    The scrolling message as one segment per arrival. A segment's line and
+    destination parts are formatted and measured once per arrival, and as
+    the arrival counts down only its short time field is formatted and
+    measured again, when the time shown changes. The message width is the
+    sum of the segment widths, and drawing skips the segments scrolled out
+    of view.
+    '''
+    def __init__(self, measure):
+        self.measure = measure
+        # measuring two strings joined can differ from the sum of their
+        # widths by the letter spacing between them
+        self.join = measure("ab") - measure("a") - measure("b")
+        self.heads = []     # (line, destination) per segment
+        self.prefixes = []  # the line, and its width
+        self.prefix_widths = []
+        self.suffixes = []  # the destination, and its width
+        self.suffix_widths = []
+        self.times = []     # the time to station shown
+        self.texts = []
+        self.widths = []
+        self.width = 0
+
+    def _set_head(self, i, head, prefix, suffix):
+        if i == len(self.heads):
+            for parts in (self.heads, self.prefixes, self.prefix_widths, self.suffixes,
+                          self.suffix_widths, self.times, self.texts, self.widths):
+                parts.append(None)
+        self.heads[i] = head
+        self.prefixes[i] = prefix
+        self.prefix_widths[i] = self.measure(prefix)
+        self.suffixes[i] = suffix
+        self.suffix_widths[i] = self.measure(suffix)
+        self.times[i] = None
+
+    def update(self, arrivals, elapsed=0):
+        '''Bring the segments up to date, returns True if the message changed.'''
+        count = max(len(arrivals), 1)
+        changed = count != len(self.heads)
+        for parts in (self.heads, self.prefixes, self.prefix_widths, self.suffixes,
+                      self.suffix_widths, self.times, self.texts, self.widths):
+            del parts[count:]
+        if len(arrivals) == 0 and not (self.heads and self.heads[0] == NO_ARRIVALS):
+            self._set_head(0, NO_ARRIVALS, NO_ARRIVALS, "")
+            self.texts[0] = NO_ARRIVALS
+            self.widths[0] = self.prefix_widths[0]
+            changed = True
+
+        for i, bus in enumerate(arrivals):
+            head = (bus[LINE], bus[DESTINATION])
+            if i == len(self.heads) or head != self.heads[i]:
+                self._set_head(i, head, '{} '.format(bus[LINE]), ' {} - '.format(bus[DESTINATION]))
+            time_to_station = max(bus[TIME_TO_STATION] - elapsed, 0)
+            if time_to_station == self.times[i]:
+                continue
+            minutes = time_to_station//60
+            seconds = time_to_station%60
+            time_text = '{:02d}m{:02d}s'.format(minutes, seconds)
+            self.times[i] = time_to_station
+            self.texts[i] = self.prefixes[i] + time_text + self.suffixes[i]
+            self.widths[i] = (self.prefix_widths[i] + self.measure(time_text) + self.suffix_widths[i]
+                              + self.join * 2)
+            changed = True
+
+        if changed:
+            self.width = sum(self.widths) + self.join * (count - 1)
+        return changed
+
+    def text(self):
+        return "".join(self.texts)
+
+    def draw(self, draw_text, x, y, view_width):
+        '''Draw the segments starting at x, skipping any out of view.'''
+        for i in range(len(self.texts)):
+            w = self.widths[i]
+            # allow for the outline a pixel either side
+            if x + w >= 0 and x <= view_width:
+                draw_text(self.texts[i], x, y)
+            x += w + self.join
+
+
+def build_message_text(arrivals, elapsed=0):
+    # elapsed is the seconds since the arrivals were fetched
+    if message.update(arrivals, elapsed) and log.enabled(log.DEBUG):
+        log.debug("%s", message.text())
 
 '''
 Display scrolling wisdom, quotes or greetz.
@@ -73,7 +196,6 @@ You can adjust the brightness with LUX + and -.
 
 connect_to_wifi()
 
-print("set up constants")
 # constants for controlling scrolling text
 PADDING = 5
 MESSAGE_COLOUR = (255, 255, 255)
@@ -87,6 +209,7 @@ STEP_TIME = 0.075
 # create galactic object and graphics surface for drawing
 gu = GalacticUnicorn()
 graphics = PicoGraphics(DISPLAY)
+pens = pen_cache(graphics)
 
 width = GalacticUnicorn.WIDTH
 height = GalacticUnicorn.HEIGHT
@@ -94,7 +217,7 @@ height = GalacticUnicorn.HEIGHT
 
 # function for drawing outlined text
 def outline_text(text, x, y):
-    graphics.set_pen(graphics.create_pen(int(OUTLINE_COLOUR[0]), int(OUTLINE_COLOUR[1]), int(OUTLINE_COLOUR[2])))
+    graphics.set_pen(pens.pen(int(OUTLINE_COLOUR[0]), int(OUTLINE_COLOUR[1]), int(OUTLINE_COLOUR[2])))
     graphics.text(text, x - 1, y - 1, -1, 1)
     graphics.text(text, x, y - 1, -1, 1)
     graphics.text(text, x + 1, y - 1, -1, 1)
@@ -104,7 +227,7 @@ def outline_text(text, x, y):
     graphics.text(text, x, y + 1, -1, 1)
     graphics.text(text, x + 1, y + 1, -1, 1)
 
-    graphics.set_pen(graphics.create_pen(int(MESSAGE_COLOUR[0]), int(MESSAGE_COLOUR[1]), int(MESSAGE_COLOUR[2])))
+    graphics.set_pen(pens.pen(int(MESSAGE_COLOUR[0]), int(MESSAGE_COLOUR[1]), int(MESSAGE_COLOUR[2])))
     graphics.text(text, x, y, -1, 1)
 
 
@@ -121,60 +244,74 @@ state = STATE_PRE_SCROLL
 # set the font
 graphics.set_font("bitmap8")
 
+message = MessageSegments(lambda text: graphics.measure_text(text, 1))
+
+
+
+async def scroll():
+    global shift, state
+
+    last_time = time.ticks_ms()
+    shown_fetch = -1
+    shown_elapsed = -1
+    dump_pressed = False
+    while True:
+        time_ms = time.ticks_ms()
+        time_gap = time_ms - last_time
+
+        # count the arrivals down each second without fetching them again
+        elapsed = max(time.ticks_diff(time_ms, fetched_ms) // 1000, 0)
+        if elapsed != shown_elapsed or fetches != shown_fetch:
+            build_message_text(arrivals, elapsed)
+            shown_elapsed = elapsed
+            shown_fetch = fetches
+        # the message width so scrolling can happen
+        msg_width = message.width
+        if log.enabled(log.DEBUG):
+            log.debug("time gap %d ms, message width %d", time_gap, msg_width, every=1000)
+
+        if gu.is_pressed(GalacticUnicorn.SWITCH_BRIGHTNESS_UP):
+            gu.adjust_brightness(+0.01)
+
+        if gu.is_pressed(GalacticUnicorn.SWITCH_BRIGHTNESS_DOWN):
+            gu.adjust_brightness(-0.01)
+
+        # the sleep button prints the recent log messages
+        if gu.is_pressed(GalacticUnicorn.SWITCH_SLEEP) != dump_pressed:
+            dump_pressed = not dump_pressed
+            if dump_pressed:
+                log.dump()
+
+        if state == STATE_PRE_SCROLL and time_ms - last_time > HOLD_TIME * 1000:
+            if msg_width + PADDING * 2 >= width:
+                state = STATE_SCROLLING
+            last_time = time_ms
+
+        if state == STATE_SCROLLING and time_ms - last_time > STEP_TIME * 1000:
+            shift += 1
+            if shift >= (msg_width + PADDING * 2) - width - 1:
+                state = STATE_POST_SCROLL
+            last_time = time_ms
+
+        if state == STATE_POST_SCROLL and time_ms - last_time > HOLD_TIME * 1000:
+            state = STATE_PRE_SCROLL
+            shift = 0
+            last_time = time_ms
+
+        graphics.set_pen(pens.pen(int(BACKGROUND_COLOUR[0]), int(BACKGROUND_COLOUR[1]), int(BACKGROUND_COLOUR[2])))
+        graphics.clear()
+
+        message.draw(outline_text, PADDING - shift, 2, width)
+
+        # update the display
+        gu.update(graphics)
+
+        # pause for a moment (important or the USB serial device will fail),
+        # which is also when the arrivals fetch gets to run
+        await asyncio.sleep_ms(1)
 
+async def main():
+    asyncio.create_task(refresh_arrivals())
+    await scroll()
 
-last_time = time.ticks_ms()
-messageTxt = ""
-while True:
-    print("Entering loop")
-    
-    time_ms = time.ticks_ms()
-    time_gap = time_ms - last_time
-    print("Current time gap = ")
-    print(time_gap)
-    
-    #if time_gap > 300000:
-    #    messageTxt = build_message_text(get_next_arrivals())
-    #    print("Getting new arrivals loop on time")
-    
-    if messageTxt=="":
-        print("Getting new arrivals loop on text")
-        messageTxt = build_message_text(get_next_arrivals())
-    # calculate the message width so scrolling can happen
-    print("continuing loop")
-    
-    msg_width = graphics.measure_text(messageTxt, 1)
-    print(msg_width)
-
-    if gu.is_pressed(GalacticUnicorn.SWITCH_BRIGHTNESS_UP):
-        gu.adjust_brightness(+0.01)
-
-    if gu.is_pressed(GalacticUnicorn.SWITCH_BRIGHTNESS_DOWN):
-        gu.adjust_brightness(-0.01)
-
-    if state == STATE_PRE_SCROLL and time_ms - last_time > HOLD_TIME * 1000:
-        if msg_width + PADDING * 2 >= width:
-            state = STATE_SCROLLING
-        last_time = time_ms
-
-    if state == STATE_SCROLLING and time_ms - last_time > STEP_TIME * 1000:
-        shift += 1
-        if shift >= (msg_width + PADDING * 2) - width - 1:
-            state = STATE_POST_SCROLL
-        last_time = time_ms
-
-    if state == STATE_POST_SCROLL and time_ms - last_time > HOLD_TIME * 1000:
-        state = STATE_PRE_SCROLL
-        shift = 0
-        last_time = time_ms
-
-    graphics.set_pen(graphics.create_pen(int(BACKGROUND_COLOUR[0]), int(BACKGROUND_COLOUR[1]), int(BACKGROUND_COLOUR[2])))
-    graphics.clear()
-    
-    outline_text(messageTxt, x=PADDING - shift, y=2)
-
-    # update the display
-    gu.update(graphics)
-
-    # pause for a moment (important or the USB serial device will fail)
-    time.sleep(0.001)
\ No newline at end of file
+asyncio.run(main())
@@ -17,6 +17,7 @@
 import time
 from galactic import GalacticUnicorn
 from picographics import PicoGraphics, DISPLAY_GALACTIC_UNICORN as DISPLAY
+from pens import pen_cache
 
 
 from mqtt_as import MQTTClient, config
@@ -40,6 +41,7 @@ STEP_TIME = 0.045 #Edit to slow down/speed up text - lower for faster scrolling
 # create galactic object and graphics surface for drawing
 gu = GalacticUnicorn()
 graphics = PicoGraphics(DISPLAY)
+pens = pen_cache(graphics)
 
 width = GalacticUnicorn.WIDTH
 height = GalacticUnicorn.HEIGHT
@@ -77,7 +79,7 @@ def sub_cb(topic, msg, retained):
     shift = 0
     state = STATE_PRE_SCROLL
     def outline_text(text, x, y):
-        graphics.set_pen(graphics.create_pen(int(OUTLINE_COLOUR[0]), int(OUTLINE_COLOUR[1]), int(OUTLINE_COLOUR[2])))
+        graphics.set_pen(pens.pen(int(OUTLINE_COLOUR[0]), int(OUTLINE_COLOUR[1]), int(OUTLINE_COLOUR[2])))
         graphics.text(text, x - 1, y - 1, -1, 1)
         graphics.text(text, x, y - 1, -1, 1)
         graphics.text(text, x + 1, y - 1, -1, 1)
@@ -87,7 +89,7 @@ def sub_cb(topic, msg, retained):
         graphics.text(text, x, y + 1, -1, 1)
         graphics.text(text, x + 1, y + 1, -1, 1)
 
-        graphics.set_pen(graphics.create_pen(int(MESSAGE_COLOUR[0]), int(MESSAGE_COLOUR[1]), int(MESSAGE_COLOUR[2])))
+        graphics.set_pen(pens.pen(int(MESSAGE_COLOUR[0]), int(MESSAGE_COLOUR[1]), int(MESSAGE_COLOUR[2])))
         graphics.text(text, x, y, -1, 1)
     
     DATA = (msg.decode('utf-8'))
@@ -132,7 +134,7 @@ def sub_cb(topic, msg, retained):
             last_time = time_ms
             
 
-        graphics.set_pen(graphics.create_pen(int(BACKGROUND_COLOUR[0]), int(BACKGROUND_COLOUR[1]), int(BACKGROUND_COLOUR[2])))
+        graphics.set_pen(pens.pen(int(BACKGROUND_COLOUR[0]), int(BACKGROUND_COLOUR[1]), int(BACKGROUND_COLOUR[2])))
         graphics.clear()
 
         outline_text(MESSAGE, x=PADDING - shift, y=2)